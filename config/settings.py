@@ -6,6 +6,7 @@ class Settings(BaseSettings):
     # App
     environment: str = "development"
     port: int = 8000
+    data_dir: str = "data"  # Almacenamiento local (detecciones, cachés)
     
     # Supabase (SIN valores por defecto - REQUERIDOS)
     supabase_url: str
@@ -14,14 +15,41 @@ class Settings(BaseSettings):
     # NASA (SIN valor por defecto - REQUERIDO)
     nasa_firms_api_key: str
     
+    # API keys adicionales de FIRMS (separadas por coma) y presupuesto por key:
+    # FIRMS admite `firms_transaction_limit` transacciones cada 10 minutos
+    nasa_firms_api_keys: str = ""
+    firms_transaction_limit: int = 5000
+    firms_cron_reserve: float = 0.2  # Fracción de cada key reservada para el cron / alertas
+    
+    # Sensores FIRMS a fusionar, en orden de prioridad
+    firms_sensors: str = "VIIRS_NOAA20_NRT,VIIRS_SNPP_NRT,MODIS_NRT"
+    firms_fusion_cell_deg: float = 0.01
+    firms_fusion_window_minutes: int = 120
+    
+    # Caché de NASA FIRMS (segundos)
+    firms_cache_ttl_seconds: int = 600
+    firms_cache_stale_seconds: int = 3600
+    
     # Google Earth Engine
     gee_service_account: str = ""
     gee_private_key_path: str = "credentials/gee-service-account.json"
     
+    # Ventana de agrupación de consultas de NDVI por punto hacia GEE (ms)
+    ndvi_batch_window_ms: int = 50
+    
     # Notificaciones (Opcionales)
     resend_api_key: str = ""
     telegram_bot_token: str = ""
     
+    # Despacho de emails (cuota de Resend: requests por segundo)
+    resend_rate_limit_per_second: float = 2.0
+    resend_batch_size: int = 100
+    notification_workers: int = 4
+    
+    # Lock del cron: "file" (por máquina) o "supabase" (compartido entre
+    # instancias; requiere migrations/001_cron_locks.sql)
+    cron_lock_backend: str = "file"
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,8 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from config.settings import get_settings
 from routes import forests, adoption, notifications, health, predictions, gamification
 from routes.fires import router as fires_router
+from services.http_client import http_pool
+from services.job_runner import job_runner
+from services.nasa_firms import FIRMSUnavailableError
 from datetime import datetime
 
 import logging
@@ -34,6 +38,21 @@ app.include_router(health.router)
 app.include_router(predictions.router, prefix="/api/v1", tags=["Predictions"])
 app.include_router(gamification.router)
 
+@app.exception_handler(FIRMSUnavailableError)
+async def firms_unavailable(request: Request, exc: FIRMSUnavailableError):
+    """FIRMS sin presupuesto ni datos cacheados: 503 en lugar de una lista vacía"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"NASA FIRMS no disponible: {exc}"},
+        headers={"Retry-After": "60"}
+    )
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Cerrar conexiones del pool HTTP compartido"""
+    await http_pool.aclose()
+    job_runner.shutdown()
+
 @app.get("/")
 def root():
     return {
@@ -50,23 +69,51 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
-@app.post("/cron/check-fires")
-async def cron_check_fires():
-    """Endpoint para ejecutar verificación de incendios (llamado por cron externo)"""
-    try:
-        from tasks.check_fires import check_fires_and_alert
-        check_fires_and_alert()
-        return {
-            "success": True,
-            "message": "Fire check completed",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "timestamp": datetime.now().isoformat()
-        }
+@app.post("/cron/check-fires", status_code=202)
+async def cron_check_fires(force: bool = False):
+    """
+    Endpoint para ejecutar verificación de incendios (llamado por cron externo)
+    
+    La verificación corre en segundo plano: se responde de inmediato con el
+    id del trabajo, consultable en /cron/jobs/{job_id}. Los disparos que
+    llegan mientras hay una verificación en curso devuelven ese mismo
+    trabajo, y cada slot de 2 horas se procesa una sola vez salvo `force`.
+    """
+    from tasks.check_fires import run_check_fires, RUN_LOCK
+    job = job_runner.submit("check-fires", run_check_fires, key=RUN_LOCK, force=force)
+    return {
+        "success": True,
+        "message": "Fire check already running" if job.coalesced else "Fire check queued",
+        "job_id": job.id,
+        "status_url": f"/cron/jobs/{job.id}",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/cron/refresh-ndvi-tile", status_code=202)
+async def cron_refresh_ndvi_tile(force: bool = False):
+    """
+    Actualizar el raster local de NDVI de Perú (llamado por cron externo)
+    
+    Corre en segundo plano como /cron/check-fires; si el raster ya tiene la
+    última composición MOD13Q1 no descarga nada salvo `force`.
+    """
+    from tasks.refresh_ndvi_tile import refresh_ndvi_tile, RUN_KEY
+    job = job_runner.submit("refresh-ndvi-tile", refresh_ndvi_tile, key=RUN_KEY, force=force)
+    return {
+        "success": True,
+        "message": "NDVI tile refresh already running" if job.coalesced else "NDVI tile refresh queued",
+        "job_id": job.id,
+        "status_url": f"/cron/jobs/{job.id}",
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/cron/jobs/{job_id}")
+def get_cron_job(job_id: str):
+    """Estado, tiempos por etapa y contadores de un trabajo del cron"""
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo {job_id} no encontrado")
+    return job.to_dict()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,8 @@
+-- Leases del cron (services/run_lock.py, CRON_LOCK_BACKEND=supabase)
+create table if not exists cron_locks (
+    name text primary key,
+    owner text not null,
+    expires_at timestamptz not null
+);
+
+create index if not exists cron_locks_expires_at_idx on cron_locks (expires_at);
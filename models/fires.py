@@ -0,0 +1,265 @@
+import csv
+import os
+import numpy as np
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.spatial import GridIndex
+from utils.storage import read_array, read_json, write_array_atomic, write_json_atomic
+
+# Columnas numéricas (float64) y categóricas (códigos uint16 + categorías)
+FLOAT_COLUMNS = ('latitude', 'longitude', 'brightness', 'scan', 'track', 'bright_t31', 'frp')
+CATEGORICAL_COLUMNS = ('acq_date', 'satellite', 'instrument', 'confidence', 'version', 'daynight')
+
+# Orden de claves de cada incendio en la respuesta JSON
+RECORD_FIELDS = (
+    'latitude', 'longitude', 'brightness', 'scan', 'track', 'acq_date', 'acq_time',
+    'satellite', 'instrument', 'confidence', 'version', 'bright_t31', 'frp', 'daynight'
+)
+
+# VIIRS publica las bandas I4/I5 con otro nombre que MODIS
+HEADER_ALIASES = {
+    'bright_ti4': 'brightness',
+    'bright_ti5': 'bright_t31',
+}
+
+REQUIRED_COLUMNS = ('latitude', 'longitude', 'acq_date', 'acq_time')
+
+
+class FireBatch:
+    """
+    Detecciones de FIRMS en formato columnar
+
+    Las coordenadas y magnitudes físicas se guardan como arreglos NumPy y los
+    campos de texto repetitivos (fecha, satélite, confianza, día/noche) como
+    códigos enteros sobre una lista de categorías. Los dicts por incendio solo
+    se generan al serializar la respuesta (`to_dicts`).
+    """
+
+    def __init__(
+        self,
+        floats: Dict[str, np.ndarray],
+        acq_time: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        categories: Dict[str, List[str]]
+    ):
+        self.floats = floats
+        self.acq_time = acq_time
+        self.codes = codes
+        self.categories = categories
+        self._index: Optional[GridIndex] = None
+        # Huella de la descarga de FIRMS de la que proviene (None si es derivado)
+        self.source_version: Optional[str] = None
+
+    @classmethod
+    def empty(cls) -> "FireBatch":
+        return cls(
+            floats={name: np.empty(0, dtype=np.float64) for name in FLOAT_COLUMNS},
+            acq_time=np.empty(0, dtype=np.int16),
+            codes={name: np.empty(0, dtype=np.uint16) for name in CATEGORICAL_COLUMNS},
+            categories={name: [] for name in CATEGORICAL_COLUMNS}
+        )
+
+    def __len__(self) -> int:
+        return len(self.acq_time)
+
+    @property
+    def latitude(self) -> np.ndarray:
+        return self.floats['latitude']
+
+    @property
+    def longitude(self) -> np.ndarray:
+        return self.floats['longitude']
+
+    @property
+    def brightness(self) -> np.ndarray:
+        return self.floats['brightness']
+
+    @property
+    def frp(self) -> np.ndarray:
+        return self.floats['frp']
+
+    @property
+    def index(self) -> GridIndex:
+        """Índice espacial de las detecciones (se construye una vez por batch)"""
+        if self._index is None:
+            self._index = GridIndex(self.latitude, self.longitude)
+        return self._index
+
+    def decode(self, name: str) -> np.ndarray:
+        """Valores de texto de una columna categórica"""
+        categories = np.asarray(self.categories[name] or [''], dtype=object)
+        return categories[self.codes[name]]
+
+    def take(self, indices: Sequence[int]) -> "FireBatch":
+        """Subconjunto de detecciones (comparte las categorías)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return FireBatch(
+            floats={name: values[indices] for name, values in self.floats.items()},
+            acq_time=self.acq_time[indices],
+            codes={name: values[indices] for name, values in self.codes.items()},
+            categories=self.categories
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["FireBatch"]) -> "FireBatch":
+        """Une varios batches re-mapeando los códigos categóricos"""
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+
+        codes = {}
+        categories = {}
+        for name in CATEGORICAL_COLUMNS:
+            merged: Dict[str, int] = {}
+            remapped = []
+            for batch in batches:
+                mapping = np.array(
+                    [merged.setdefault(value, len(merged)) for value in batch.categories[name]] or [0],
+                    dtype=np.uint16
+                )
+                remapped.append(mapping[batch.codes[name]])
+            codes[name] = np.concatenate(remapped)
+            categories[name] = list(merged)
+
+        return cls(
+            floats={name: np.concatenate([b.floats[name] for b in batches]) for name in FLOAT_COLUMNS},
+            acq_time=np.concatenate([b.acq_time for b in batches]),
+            codes=codes,
+            categories=categories
+        )
+
+    def to_dicts(self, indices: Optional[Sequence[int]] = None) -> List[Dict]:
+        """
+        Convierte detecciones a dicts (frontera JSON)
+
+        Args:
+            indices: Detecciones a convertir, en ese orden (todas si es None)
+
+        Returns:
+            Lista de incendios con las mismas claves que el CSV de FIRMS
+        """
+        batch = self if indices is None else self.take(indices)
+
+        columns = {name: values.tolist() for name, values in batch.floats.items()}
+        columns['acq_time'] = [f"{t:04d}" for t in batch.acq_time.tolist()]
+        for name in CATEGORICAL_COLUMNS:
+            columns[name] = batch.decode(name).tolist()
+
+        return [
+            dict(zip(RECORD_FIELDS, values))
+            for values in zip(*(columns[field] for field in RECORD_FIELDS))
+        ]
+
+    def keys(self) -> List[Tuple]:
+        """Claves de de-duplicación (lat, lon, acq_date, acq_time, satellite)"""
+        return list(zip(
+            self.latitude.tolist(),
+            self.longitude.tolist(),
+            self.decode('acq_date').tolist(),
+            self.acq_time.tolist(),
+            self.decode('satellite').tolist()
+        ))
+
+    def save(self, path: str) -> None:
+        """Guarda el batch como un directorio de arreglos .npy"""
+        for name, values in self.floats.items():
+            write_array_atomic(os.path.join(path, f"{name}.npy"), values)
+        write_array_atomic(os.path.join(path, "acq_time.npy"), self.acq_time)
+        for name, values in self.codes.items():
+            write_array_atomic(os.path.join(path, f"{name}.codes.npy"), values)
+        write_json_atomic(os.path.join(path, "categories.json"), self.categories)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "FireBatch":
+        """
+        Carga un batch guardado con `save`
+
+        Args:
+            path: Directorio del batch
+            mmap: Abrir los arreglos en modo memory-mapped (solo lectura)
+
+        Returns:
+            FireBatch (vacío si el directorio no existe)
+        """
+        categories = read_json(os.path.join(path, "categories.json"))
+        if categories is None:
+            return cls.empty()
+
+        return cls(
+            floats={name: read_array(os.path.join(path, f"{name}.npy"), mmap) for name in FLOAT_COLUMNS},
+            acq_time=read_array(os.path.join(path, "acq_time.npy"), mmap),
+            codes={name: read_array(os.path.join(path, f"{name}.codes.npy"), mmap) for name in CATEGORICAL_COLUMNS},
+            categories=categories
+        )
+
+    def record(self, i: int) -> Dict:
+        """Una detección como dict"""
+        return self.to_dicts([i])[0]
+
+    @classmethod
+    def from_csv(cls, lines: Iterable[str]) -> "FireBatch":
+        """
+        Decodifica un CSV de FIRMS (MODIS o VIIRS) en columnas
+
+        Las columnas se ubican por nombre de encabezado, no por posición.
+        Las filas con valores inválidos se descartan.
+
+        Args:
+            lines: Líneas del CSV, incluido el encabezado (puede ser un stream)
+
+        Returns:
+            FireBatch con las detecciones
+        """
+        reader = csv.reader(line for line in lines if line.strip())
+
+        header = next(reader, None)
+        if header is None:
+            return cls.empty()
+
+        positions = {}
+        for i, name in enumerate(header):
+            name = HEADER_ALIASES.get(name.strip(), name.strip())
+            positions.setdefault(name, i)
+
+        missing = [name for name in REQUIRED_COLUMNS if name not in positions]
+        if missing:
+            raise ValueError(f"CSV de FIRMS sin columnas {missing}: {','.join(header)[:120]}")
+
+        float_positions = [(array('d'), positions.get(name)) for name in FLOAT_COLUMNS]
+        categorical_positions = [(array('H'), positions.get(name), {}) for name in CATEGORICAL_COLUMNS]
+        acq_time = array('h')
+        time_position = positions['acq_time']
+        nan = float('nan')
+
+        for row in reader:
+            try:
+                float_values = [float(row[pos]) if pos is not None else nan for _, pos in float_positions]
+                time_value = int(row[time_position])
+                text_values = [row[pos] if pos is not None else '' for _, pos, _ in categorical_positions]
+            except (ValueError, IndexError):
+                continue
+
+            for (buffer, _), value in zip(float_positions, float_values):
+                buffer.append(value)
+            acq_time.append(time_value)
+            for (buffer, _, mapping), value in zip(categorical_positions, text_values):
+                buffer.append(mapping.setdefault(value, len(mapping)))
+
+        return cls(
+            floats={
+                name: np.array(buffer, dtype=np.float64)
+                for name, (buffer, _) in zip(FLOAT_COLUMNS, float_positions)
+            },
+            acq_time=np.array(acq_time, dtype=np.int16),
+            codes={
+                name: np.array(buffer, dtype=np.uint16)
+                for name, (buffer, _, _) in zip(CATEGORICAL_COLUMNS, categorical_positions)
+            },
+            categories={
+                name: list(mapping)
+                for name, (_, _, mapping) in zip(CATEGORICAL_COLUMNS, categorical_positions)
+            }
+        )
@@ -4,6 +4,7 @@ from services.database import DatabaseService, supabase
 from services.notifier import notification_service
 from typing import Optional
 from services.earth_engine import earth_engine_service
+from services.geofence import geofence_index
 
 router = APIRouter(prefix="/api/v1", tags=["Adoption"])
 
@@ -55,6 +56,13 @@ def adopt_forest(request: AdoptionRequest):
         # Obtener info del bosque para el email
         forest = DatabaseService.get_forest_by_id(request.forest_id)
         
+        # Suscribir la adopción a las alertas de incendio de su zona
+        try:
+            geofence_index.add(adoption, forest)
+        except Exception as geofence_error:
+            print(f"Error actualizando geofence: {geofence_error}")
+            # El cron reconstruye el índice desde la base en cada corrida
+        
         # Enviar email de confirmación
         try:
             notification_service.send_adoption_email(
@@ -82,6 +90,22 @@ def adopt_forest(request: AdoptionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.delete("/adopt/{adoption_id}")
+def deactivate_adoption(adoption_id: str):
+    """Desactivar una adopción (deja de recibir alertas)"""
+    adoption = DatabaseService.deactivate_adoption(adoption_id)
+    if adoption is None:
+        raise HTTPException(status_code=404, detail=f"Active adoption {adoption_id} not found")
+    
+    geofence_index.remove(adoption_id)
+    
+    return {
+        "success": True,
+        "message": "Adoption deactivated",
+        "adoption_id": adoption['id']
+    }
+
+
 @router.get("/guardian/{email}")
 def get_guardian_info(email: str):
     """Info del guardián con salud NASA de bosques adoptados"""
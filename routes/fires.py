@@ -1,6 +1,11 @@
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict
-from services.nasa_firms import nasa_firms_service
+from services.nasa_firms import nasa_firms_service, FIRMS_MAX_DAYS, FIRMSUnavailableError
+from services.fire_rollups import FireRollups, fire_rollups
+from services.fire_archive import fire_archive
+from services.fire_events import DEFAULT_EPS_KM, DEFAULT_WINDOW_HOURS
+from datetime import date, timedelta
 from services.database import supabase
 
 router = APIRouter(prefix="/api/v1/fires", tags=["Fires"])
@@ -16,16 +21,48 @@ async def get_fires_peru(
     
     Retorna lista de incendios con coordenadas, brillo, confianza, etc.
     """
-    fires = nasa_firms_service.get_fires_peru(days)
+    fires = await nasa_firms_service.get_fires_peru(days)
     
     return {
         "success": True,
         "count": len(fires),
         "days_queried": days,
-        "source": "NASA FIRMS - VIIRS",
+        "source": nasa_firms_service.source,
         "fires": fires
     }
 
+@router.get("/events")
+async def get_fire_events(
+    days: int = Query(default=1, ge=1, le=10, description="Días hacia atrás (1-10)"),
+    eps_km: float = Query(default=DEFAULT_EPS_KM, gt=0, le=10, description="Distancia máxima entre detecciones de un mismo evento"),
+    window_hours: float = Query(default=DEFAULT_WINDOW_HOURS, gt=0, le=240, description="Separación temporal máxima entre detecciones de un mismo evento"),
+    min_detections: int = Query(default=1, ge=1, description="Detecciones mínimas por evento")
+) -> Dict:
+    """
+    Obtiene los eventos de incendio activos en Perú
+    
+    Las detecciones adyacentes en espacio y tiempo (p. ej. varios píxeles
+    MODIS de una misma quema) se agrupan en un único evento con centroide,
+    envolvente, FRP total y primera/última detección.
+    
+    - **days**: Número de días hacia atrás (máximo 10)
+    - **eps_km**: Distancia de agrupación en km
+    - **window_hours**: Ventana temporal de agrupación en horas
+    - **min_detections**: Omitir eventos con menos detecciones
+    """
+    events = await nasa_firms_service.get_fire_events(days, eps_km=eps_km, window_hours=window_hours)
+    events = [e for e in events if e['detections'] >= min_detections]
+    events.sort(key=lambda e: e['total_frp'], reverse=True)
+    
+    return {
+        "success": True,
+        "count": len(events),
+        "detections": sum(e['detections'] for e in events),
+        "days_queried": days,
+        "source": nasa_firms_service.source,
+        "events": events
+    }
+
 @router.get("/forest/{forest_id}")
 async def get_fires_near_forest(
     forest_id: str,
@@ -39,11 +76,14 @@ async def get_fires_near_forest(
     - **radius_km**: Radio de búsqueda en kilómetros (1-100)
     - **days**: Días hacia atrás (1-10)
     
-    Retorna incendios dentro del radio especificado ordenados por distancia.
+    Retorna incendios dentro del radio especificado ordenados por distancia,
+    y los eventos (incendios agrupados) a los que pertenecen.
     """
     
     # Obtener datos del bosque desde Supabase
-    result = supabase.table('forests').select('*').eq('id', forest_id).execute()
+    result = await run_in_threadpool(
+        supabase.table('forests').select('*').eq('id', forest_id).execute
+    )
     
     if not result.data or len(result.data) == 0:
         raise HTTPException(status_code=404, detail=f"Bosque con ID {forest_id} no encontrado")
@@ -51,7 +91,13 @@ async def get_fires_near_forest(
     forest = result.data[0]
     
     # Obtener incendios cercanos
-    nearby_fires = nasa_firms_service.get_fires_near_location(
+    nearby_fires = await nasa_firms_service.get_fires_near_location(
+        latitude=forest['latitude'],
+        longitude=forest['longitude'],
+        radius_km=radius_km,
+        days=days
+    )
+    nearby_events = await nasa_firms_service.get_events_near_location(
         latitude=forest['latitude'],
         longitude=forest['longitude'],
         radius_km=radius_km,
@@ -84,49 +130,100 @@ async def get_fires_near_forest(
         "risk_assessment": {
             "level": risk_level,
             "fires_detected": len(nearby_fires),
+            "events_detected": len(nearby_events),
             "closest_fire_km": nearby_fires[0]['distance_km'] if nearby_fires else None
         },
+        "events": nearby_events,
         "fires": nearby_fires
     }
 
 @router.get("/stats")
-async def get_fire_statistics(days: int = Query(default=7, ge=1, le=30)) -> Dict:
+async def get_fire_statistics(
+    days: int = Query(default=7, ge=1, le=365),
+    by_region: bool = Query(default=False, description="Incluir desglose por región (celdas de 1°)")
+) -> Dict:
     """
     Obtiene estadísticas generales de incendios en Perú
     
-    - **days**: Período de análisis en días
+    - **days**: Período de análisis en días (1-365)
+    - **by_region**: Incluir conteos por región
     
-    Retorna resumen estadístico de incendios.
+    Retorna resumen estadístico de incendios a partir de los agregados
+    diarios que mantiene la ingesta. Los días que ninguna ingesta cubrió se
+    completan desde FIRMS si están entre los últimos 10 y, si no, desde el
+    archivo histórico de detecciones. `uncovered_days` indica cuántos días
+    quedaron sin ninguna fuente.
     """
-    fires = nasa_firms_service.get_fires_peru(days)
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    rollups = fire_rollups
+    data_sources = ["rollups"]
+    uncovered = fire_rollups.uncovered_days(start, end)
+    
+    # Días recientes sin ingesta: FIRMS (solo los días que faltan)
+    firms_start = end - timedelta(days=FIRMS_MAX_DAYS - 1)
+    recent = [day for day in uncovered if day >= firms_start]
+    if recent:
+        try:
+            batch = await nasa_firms_service.get_fire_batch((end - recent[0]).days + 1)
+        except FIRMSUnavailableError as e:
+            print(f"⚠️ FIRMS no disponible para completar estadísticas: {e}")
+        else:
+            rollups = rollups.filled_from(FireRollups.from_batch(batch), recent)
+            data_sources.append("firms")
+            uncovered = [day for day in uncovered if day < firms_start]
+    
+    # Días más antiguos sin ingesta: archivo histórico
+    older = [day for day in uncovered if day < firms_start]
+    if older:
+        archived_dates = set(await run_in_threadpool(fire_archive.dates))
+        from_archive = [day for day in older if day.isoformat() in archived_dates]
+        if from_archive:
+            archived = await run_in_threadpool(fire_archive.query, from_archive[0], from_archive[-1])
+            rollups = rollups.filled_from(FireRollups.from_batch(archived), from_archive)
+            data_sources.append("archive")
+            uncovered = [day for day in uncovered if day.isoformat() not in archived_dates]
     
-    if not fires:
+    stats = rollups.summary(start, end, include_regions=by_region)
+    coverage = {
+        "data_source": "+".join(data_sources),
+        "uncovered_days": len(uncovered),
+        "last_ingest": fire_rollups.updated_at
+    }
+    
+    if not stats["total_fires"]:
+        if uncovered:
+            # Sin datos no es lo mismo que sin incendios
+            message = f"No hay datos de {len(uncovered)} de los {days} días del período"
+        else:
+            message = "No se detectaron incendios en el período"
         return {
             "success": True,
             "period_days": days,
             "total_fires": 0,
-            "message": "No se detectaron incendios en el período"
+            "message": message,
+            **coverage
         }
     
-    # Calcular estadísticas
-    total_fires = len(fires)
-    high_confidence = len([f for f in fires if f['confidence'] in ['high', 'h']])
-    avg_brightness = sum(f['brightness'] for f in fires) / total_fires
-    
-    # Incendios por día
-    fires_by_date = {}
-    for fire in fires:
-        date = fire['acq_date']
-        fires_by_date[date] = fires_by_date.get(date, 0) + 1
-    
     return {
         "success": True,
         "period_days": days,
-        "total_fires": total_fires,
-        "high_confidence_fires": high_confidence,
-        "average_brightness": round(avg_brightness, 2),
-        "fires_by_date": fires_by_date,
-        "source": "NASA FIRMS - VIIRS"
+        **stats,
+        "source": nasa_firms_service.source,
+        **coverage
+    }
+
+@router.get("/budget")
+def get_firms_budget() -> Dict:
+    """
+    Consumo del presupuesto de transacciones de FIRMS por API key
+    
+    Las keys se muestran enmascaradas; `blocked` indica que FIRMS rechazó
+    la key en la ventana actual.
+    """
+    return {
+        "success": True,
+        **nasa_firms_service.budget.status()
     }
 
 @router.get("/analyze")
@@ -148,7 +245,7 @@ async def analyze_location(
     """
     
     # Obtener incendios cercanos a las coordenadas
-    nearby_fires = nasa_firms_service.get_fires_near_location(
+    nearby_fires = await nasa_firms_service.get_fires_near_location(
         latitude=lat,
         longitude=lon,
         radius_km=radius_km,
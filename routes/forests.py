@@ -19,14 +19,17 @@ def get_all_forests():
     if not forests:
         raise HTTPException(status_code=404, detail="No forests found")
     
+    # NDVI real desde NASA para todo el catálogo en una sola consulta
+    health_by_forest = earth_engine_service.get_forests_ndvi({
+        forest['id']: (forest['latitude'], forest['longitude'])
+        for forest in forests
+        if forest.get('latitude') is not None and forest.get('longitude') is not None
+    })
+    
     # Agregar health_nasa a cada bosque
     for forest in forests:
         try:
-            # Obtener NDVI real desde NASA
-            health_data = earth_engine_service.get_forest_ndvi(
-                lat=forest['latitude'],
-                lon=forest['longitude']
-            )
+            health_data = health_by_forest[forest['id']]
             
             forest['health_nasa'] = {
                 "ndvi_value": health_data['ndvi_value'],
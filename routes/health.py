@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query
 from services.earth_engine import earth_engine_service
 from services.database import DatabaseService
+from services.ndvi_batcher import ndvi_point_batcher
 
 router = APIRouter(prefix="/api/v1", tags=["Forest Health"])
 
@@ -89,7 +90,7 @@ def get_forest_history(
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/analyze/point")
-def analyze_point(
+async def analyze_point(
     lat: float = Query(..., ge=-90, le=90, description="Latitud (-90 a 90)"),
     lon: float = Query(..., ge=-180, le=180, description="Longitud (-180 a 180)")
 ):
@@ -104,8 +105,8 @@ def analyze_point(
         Datos NDVI y salud del punto seleccionado
     """
     try:
-        # Obtener NDVI del punto
-        health_data = earth_engine_service.get_forest_ndvi(lat=lat, lon=lon)
+        # Obtener NDVI del punto (agrupado con otras consultas simultáneas)
+        health_data = await ndvi_point_batcher.get(lat, lon)
         
         return {
             "location": {
@@ -64,4 +64,18 @@ class DatabaseService:
             return response.data
         except Exception as e:
             logger.error(f"Error: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    @staticmethod
+    def deactivate_adoption(adoption_id: str) -> Optional[Dict]:
+        """Desactivar adopción (None si no existe o ya estaba inactiva)"""
+        try:
+            response = supabase.table('adopted_forests')\
+                .update({'is_active': False})\
+                .eq('id', adoption_id)\
+                .eq('is_active', True)\
+                .execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"Error: {str(e)}")
+            raise
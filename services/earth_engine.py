@@ -1,12 +1,29 @@
 import ee
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, Hashable, List, Optional, Tuple
 import json
+import numpy as np
+from services.ndvi_cache import MODIS_PIXEL_DEG, NDVICache, ndvi_cache
+from services.ndvi_history import NDVIHistoryStore, ndvi_history_store
+from services.ndvi_tile import NODATA, NDVITile, ndvi_tile
+
+# Puntos por llamada de muestreo en lote (tamaño del request a GEE)
+NDVI_BATCH_SIZE = 5000
 
 class EarthEngineService:
-    def __init__(self):
+    def __init__(
+        self,
+        cache: NDVICache = ndvi_cache,
+        tile: NDVITile = ndvi_tile,
+        history: NDVIHistoryStore = ndvi_history_store
+    ):
         """Inicializar Earth Engine con service account"""
+        self.cache = cache
+        self.tile = tile
+        self.history = history
+        self.cache.purge()
+        
         try:
             # Intentar cargar desde variable de entorno primero (Railway)
             gee_json = os.getenv('GEE_SERVICE_ACCOUNT_JSON')
@@ -44,81 +61,210 @@ class EarthEngineService:
         Returns:
             Dict con NDVI y estado de salud
         """
+        return self.get_forests_ndvi({"point": (lat, lon)})["point"]
+    
+    def get_forests_ndvi(self, points: Dict[Hashable, Tuple[float, float]]) -> Dict[Hashable, Dict]:
+        """
+        Obtener NDVI actual de varios puntos en una sola consulta a GEE
+        
+        Los puntos dentro del raster local de Perú se leen de él; fuera del
+        raster se usa la caché de NDVI, y solo los puntos sin valor vigente
+        se muestrean contra la composición MOD13Q1 más reciente con un
+        único `reduceRegions` (una llamada `getInfo()` por cada
+        NDVI_BATCH_SIZE puntos).
+        
+        Args:
+            points: {id: (lat, lon)}, p. ej. id de bosque → coordenadas
+        
+        Returns:
+            {id: dict con NDVI y estado de salud}; si GEE no responde se usa
+            la última composición cacheada aunque esté vencida, y los puntos
+            sin ningún dato reciben la estimación de respaldo
+        """
+        results = self.get_local_ndvi(points)
+        missing = [point_id for point_id in points if point_id not in results]
+        unavailable = [] if self.initialized else missing
+        if self.initialized and missing:
+            for start in range(0, len(missing), NDVI_BATCH_SIZE):
+                chunk = missing[start:start + NDVI_BATCH_SIZE]
+                try:
+                    samples = self._sample_latest_ndvi(chunk, points)
+                except Exception as e:
+                    print(f"Error obteniendo NDVI para {len(chunk)} puntos: {e}")
+                    unavailable.extend(chunk)
+                    continue
+                
+                self.cache.put_many(
+                    (*points[point_id], ndvi_raw, composite_date)
+                    for point_id, (ndvi_raw, composite_date) in samples.items()
+                )
+                now = datetime.now().isoformat()
+                for point_id, (ndvi_raw, composite_date) in samples.items():
+                    results[point_id] = self._ndvi_result(ndvi_raw, composite_date, now)
+        
+        stale = self.cache.get_many({point_id: points[point_id] for point_id in unavailable}, include_expired=True)
+        for point_id, cached in stale.items():
+            results[point_id] = self._ndvi_result(cached['ndvi_raw'], cached['composite_date'], cached['fetched_at'])
+        
+        for point_id, (lat, lon) in points.items():
+            if point_id not in results:
+                results[point_id] = self._get_fallback_health(lat, lon)
+        return results
+    
+    def get_local_ndvi(self, points: Dict[Hashable, Tuple[float, float]]) -> Dict[Hashable, Dict]:
+        """
+        NDVI de los puntos que se pueden resolver sin GEE (raster y caché)
+        
+        Returns:
+            {id: dict con NDVI y estado de salud}, solo para esos puntos
+        """
+        results = {}
+        for point_id, (ndvi_raw, composite_date) in self.tile.lookup_many(points).items():
+            results[point_id] = self._ndvi_result(ndvi_raw, composite_date, self.tile.metadata['built_at'])
+        
+        outside = {point_id: point for point_id, point in points.items() if point_id not in results}
+        for point_id, cached in self.cache.get_many(outside).items():
+            results[point_id] = self._ndvi_result(cached['ndvi_raw'], cached['composite_date'], cached['fetched_at'])
+        return results
+    
+    def _sample_latest_ndvi(
+        self,
+        ids: List[Hashable],
+        points: Dict[Hashable, Tuple[float, float]]
+    ) -> Dict[Hashable, Tuple[int, str]]:
+        """
+        Muestrea la composición más reciente en los puntos `ids` (un getInfo)
+        
+        Returns:
+            {id: (NDVI crudo de MODIS, fecha de la composición)}
+        """
+        features = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Point([points[point_id][1], points[point_id][0]]), {'key': position})
+            for position, point_id in enumerate(ids)
+        ])
+        
+        latest = self._latest_composite(features.geometry())
+        sampled = latest.reduceRegions(
+            collection=features,
+            reducer=ee.Reducer.first().setOutputs(['NDVI']),
+            scale=250
+        )
+        info = ee.Dictionary({
+            'composite_date': latest.date().format('YYYY-MM-dd'),
+            'samples': sampled.select(['key', 'NDVI'], None, False)
+        }).getInfo()
+        
+        results = {}
+        for feature in info['samples']['features']:
+            position = feature['properties']['key']
+            ndvi_raw = feature['properties'].get('NDVI')
+            if ndvi_raw is None:
+                continue  # Píxel enmascarado (nubes, agua)
+            results[ids[position]] = (int(ndvi_raw), info['composite_date'])
+        return results
+    
+    @staticmethod
+    def _latest_composite(region) -> ee.Image:
+        """Imagen NDVI de MOD13Q1 más reciente (últimos 60 días) sobre la región"""
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=60)
+        return ee.ImageCollection('MODIS/061/MOD13Q1') \
+            .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
+            .filterBounds(region) \
+            .select('NDVI') \
+            .sort('system:time_start', False) \
+            .first()
+    
+    def refresh_ndvi_tile(self, tile: Optional[NDVITile] = None, force: bool = False) -> bool:
+        """
+        Descarga la composición más reciente al raster local
+        
+        Se descarga por bloques con `ee.data.computePixels` en la grilla del
+        raster (EPSG:4326, MODIS_PIXEL_DEG).
+        
+        Args:
+            tile: Raster a actualizar (por defecto el del servicio)
+            force: Descargar aunque el raster ya tenga esa composición
+        
+        Returns:
+            True si se descargó una composición nueva
+        """
         if not self.initialized:
-            return self._get_fallback_health(lat, lon)
+            raise RuntimeError("Earth Engine no está inicializado")
         
-        try:
-            # Punto de interés
-            point = ee.Geometry.Point([lon, lat])
-            
-            # Obtener imagen MODIS más reciente (últimos 60 días - más rango)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=60)  # Aumentado de 30 a 60
-            
-            modis = ee.ImageCollection('MODIS/061/MOD13Q1') \
-                .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
-                .filterBounds(point) \
-                .select('NDVI') \
-                .sort('system:time_start', False)  # Ordenar por fecha descendente
-            
-            # Verificar que hay imágenes
-            count = modis.size().getInfo()
-            if count == 0:
-                print(f"⚠️ No hay imágenes MODIS para punto ({lat}, {lon})")
-                return self._get_fallback_health(lat, lon)
-            
-            # Obtener primera imagen
-            first_image = modis.first()
-            
-            # Obtener valor NDVI en el punto
-            sample = first_image.sample(point, 250).first()
-            
-            if sample is None:
-                print(f"⚠️ Sample devolvió None para punto ({lat}, {lon})")
-                return self._get_fallback_health(lat, lon)
-            
-            ndvi_raw = sample.get('NDVI').getInfo()
-            
-            # MODIS NDVI viene en escala -2000 a 10000, convertir a -1 a 1
-            ndvi_value = ndvi_raw / 10000.0
-            
-            # Calcular porcentaje de salud (0-100)
-            if ndvi_value > 0.6:
-                health_percentage = int(90 + (ndvi_value - 0.6) * 25)
-            elif ndvi_value > 0.4:
-                health_percentage = int(70 + (ndvi_value - 0.4) * 100)
-            elif ndvi_value > 0.2:
-                health_percentage = int(40 + (ndvi_value - 0.2) * 150)
-            else:
-                health_percentage = int(max(0, ndvi_value * 200))
-            
-            # Determinar estado y color
-            if health_percentage >= 70:
-                status = "Healthy"
-                color = "#10b981"  # Verde
-            elif health_percentage >= 50:
-                status = "At Risk"
-                color = "#f59e0b"  # Amarillo
-            elif health_percentage >= 30:
-                status = "Deteriorated"
-                color = "#f97316"  # Naranja
-            else:
-                status = "Critical"
-                color = "#ef4444"  # Rojo
-            
-            return {
-                "ndvi_value": round(ndvi_value, 3),
-                "health_percentage": health_percentage,
-                "status": status,
-                "color": color,
-                "source": "MODIS/061/MOD13Q1 (NASA)",
-                "is_real_data": True,
-                "last_update": end_date.isoformat()
-            }
-            
-        except Exception as e:
-            print(f"Error obteniendo NDVI para ({lat}, {lon}): {e}")
-            return self._get_fallback_health(lat, lon)
+        tile = tile or self.tile
+        latest = self._latest_composite(ee.Geometry.Rectangle(list(tile.bbox)))
+        composite_date = latest.date().format('YYYY-MM-dd').getInfo()
+        if not force and composite_date == tile.composite_date:
+            print(f"ℹ️  El raster de NDVI ya tiene la composición {composite_date}")
+            return False
+        
+        image = latest.unmask(NODATA).toInt16()
+        
+        def fetch_chunk(west: float, north: float, width: int, height: int) -> np.ndarray:
+            pixels = ee.data.computePixels({
+                'expression': image,
+                'fileFormat': 'NUMPY_NDARRAY',
+                'grid': {
+                    'dimensions': {'width': width, 'height': height},
+                    'affineTransform': {
+                        'scaleX': MODIS_PIXEL_DEG, 'shearX': 0, 'translateX': west,
+                        'shearY': 0, 'scaleY': -MODIS_PIXEL_DEG, 'translateY': north
+                    },
+                    'crsCode': 'EPSG:4326'
+                }
+            })
+            return pixels['NDVI']
+        
+        print(f"🛰️  Descargando NDVI {composite_date} ({tile.width}x{tile.height} píxeles)...")
+        tile.refresh(composite_date, fetch_chunk)
+        print(f"✅ Raster de NDVI actualizado: {composite_date}")
+        return True
+    
+    def _ndvi_result(self, ndvi_raw: int, composite_date: str, last_update: str) -> Dict:
+        """Respuesta de salud para un NDVI crudo de MOD13Q1"""
+        # MODIS NDVI viene en escala -2000 a 10000, convertir a -1 a 1
+        return {
+            **self._health_from_ndvi(ndvi_raw / 10000.0),
+            "source": "MODIS/061/MOD13Q1 (NASA)",
+            "is_real_data": True,
+            "composite_date": composite_date,
+            "last_update": last_update
+        }
+    
+    @staticmethod
+    def _health_from_ndvi(ndvi_value: float) -> Dict:
+        """Porcentaje de salud, estado y color para un NDVI (-1 a 1)"""
+        # Calcular porcentaje de salud (0-100)
+        if ndvi_value > 0.6:
+            health_percentage = int(90 + (ndvi_value - 0.6) * 25)
+        elif ndvi_value > 0.4:
+            health_percentage = int(70 + (ndvi_value - 0.4) * 100)
+        elif ndvi_value > 0.2:
+            health_percentage = int(40 + (ndvi_value - 0.2) * 150)
+        else:
+            health_percentage = int(max(0, ndvi_value * 200))
+        
+        # Determinar estado y color
+        if health_percentage >= 70:
+            status = "Healthy"
+            color = "#10b981"  # Verde
+        elif health_percentage >= 50:
+            status = "At Risk"
+            color = "#f59e0b"  # Amarillo
+        elif health_percentage >= 30:
+            status = "Deteriorated"
+            color = "#f97316"  # Naranja
+        else:
+            status = "Critical"
+            color = "#ef4444"  # Rojo
+        
+        return {
+            "ndvi_value": round(ndvi_value, 3),
+            "health_percentage": health_percentage,
+            "status": status,
+            "color": color
+        }
     
     def _get_fallback_health(self, lat: float, lon: float) -> Dict:
         """Estimación de salud cuando GEE no está disponible"""
@@ -156,6 +302,10 @@ class EarthEngineService:
         """
         Obtener histórico de NDVI
         
+        Se responde desde el almacén local de series por píxel; a GEE solo se
+        le piden las composiciones que faltan (las publicadas después de la
+        última guardada, o las anteriores si se pide un rango más largo).
+        
         Args:
             lat: Latitud
             lon: Longitud
@@ -164,50 +314,74 @@ class EarthEngineService:
         Returns:
             Lista de valores NDVI históricos
         """
-        if not self.initialized:
-            return self._get_fallback_history(months)
+        end = date.today()
+        start = end - timedelta(days=months * 30)
+        series = self.history.get(lat, lon)
         
-        try:
-            point = ee.Geometry.Point([lon, lat])
-            
-            # Calcular fechas
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=months * 30)
-            
-            # Obtener colección MODIS
-            modis = ee.ImageCollection('MODIS/061/MOD13Q1') \
-                .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')) \
-                .filterBounds(point) \
-                .select('NDVI')
-            
-            # Extraer valores
-            def extract_ndvi(image):
-                date = ee.Date(image.get('system:time_start'))
-                ndvi = image.sample(point, 250).first().get('NDVI')
-                return ee.Feature(None, {
-                    'date': date.format('YYYY-MM-dd'),
-                    'ndvi': ee.Number(ndvi).divide(10000)
-                })
-            
-            features = modis.map(extract_ndvi).getInfo()
-            
-            history = []
-            for feature in features['features']:
-                props = feature['properties']
-                ndvi_val = props['ndvi']
-                health = int(min(100, max(0, ndvi_val * 150)))
-                
-                history.append({
-                    'date': props['date'],
-                    'ndvi': round(ndvi_val, 3),
-                    'health': health
-                })
-            
-            return sorted(history, key=lambda x: x['date'])
-            
-        except Exception as e:
-            print(f"Error obteniendo histórico: {e}")
+        if self.initialized:
+            try:
+                if series is None:
+                    series = self.history.merge(
+                        lat, lon, self._fetch_ndvi_series(lat, lon, start, end + timedelta(days=1)), since=start
+                    )
+                else:
+                    # Primero las composiciones nuevas, luego el relleno hacia atrás
+                    # (que no cuenta como consulta de novedades)
+                    if series.needs_update():
+                        after = series.last_date or date.fromordinal(series.since)
+                        series = self.history.merge(
+                            lat, lon,
+                            self._fetch_ndvi_series(lat, lon, after + timedelta(days=1), end + timedelta(days=1)),
+                            since=date.fromordinal(series.since)
+                        )
+                    if start.toordinal() < series.since:
+                        series = self.history.merge(
+                            lat, lon,
+                            self._fetch_ndvi_series(lat, lon, start, date.fromordinal(series.since)),
+                            since=start,
+                            checked=False
+                        )
+            except Exception as e:
+                print(f"Error obteniendo histórico: {e}")
+        
+        if series is None:
             return self._get_fallback_history(months)
+        
+        dates, values = series.range(start, end)
+        history = []
+        for ordinal, ndvi_raw in zip(dates.tolist(), values.tolist()):
+            ndvi_val = ndvi_raw / 10000.0
+            history.append({
+                'date': date.fromordinal(ordinal).isoformat(),
+                'ndvi': round(ndvi_val, 3),
+                'health': int(min(100, max(0, ndvi_val * 150)))
+            })
+        return history
+    
+    def _fetch_ndvi_series(self, lat: float, lon: float, start: date, end: date) -> List[Tuple[str, Optional[int]]]:
+        """
+        Composiciones MOD13Q1 de un punto entre `start` (inclusive) y `end` (exclusive)
+        
+        Returns:
+            (fecha ISO, NDVI crudo o None si el píxel estaba enmascarado)
+        """
+        point = ee.Geometry.Point([lon, lat])
+        modis = ee.ImageCollection('MODIS/061/MOD13Q1') \
+            .filterDate(start.isoformat(), end.isoformat()) \
+            .filterBounds(point) \
+            .select('NDVI')
+        
+        def extract_ndvi(image):
+            return ee.Feature(None, {
+                'date': image.date().format('YYYY-MM-dd'),
+                'ndvi_raw': image.reduceRegion(ee.Reducer.first(), point, 250).get('NDVI')
+            })
+        
+        features = modis.map(extract_ndvi).getInfo()
+        return [
+            (feature['properties']['date'], feature['properties'].get('ndvi_raw'))
+            for feature in features['features']
+        ]
     
     def _get_fallback_history(self, months: int) -> List[Dict]:
         """Histórico simulado cuando GEE no disponible"""
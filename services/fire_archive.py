@@ -0,0 +1,83 @@
+import os
+import threading
+import numpy as np
+from datetime import date, timedelta
+from typing import List
+
+from config.settings import get_settings
+from models.fires import FireBatch
+
+settings = get_settings()
+
+
+class FireArchive:
+    """
+    Archivo histórico local de detecciones, particionado por fecha
+
+    Estructura: `<root>/<acq_date>/part-NNNNN/` con un FireBatch por parte
+    (arreglos .npy). Las partes solo se agregan, nunca se reescriben, y se
+    leen en modo memory-mapped, así que consultar meses de historia no
+    requiere llamadas a FIRMS.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def append(self, batch: FireBatch) -> None:
+        """
+        Agrega detecciones (ya de-duplicadas) a sus particiones diarias
+
+        Args:
+            batch: Detecciones nuevas, normalmente el delta de una ingesta
+        """
+        if not len(batch):
+            return
+
+        with self._lock:
+            for code, acq_date in enumerate(batch.categories['acq_date']):
+                rows = np.flatnonzero(batch.codes['acq_date'] == code)
+                if len(rows):
+                    self._write_part(acq_date, batch.take(rows))
+
+    def _write_part(self, acq_date: str, batch: FireBatch) -> None:
+        day_dir = os.path.join(self.root, acq_date)
+        os.makedirs(day_dir, exist_ok=True)
+
+        part = len([name for name in os.listdir(day_dir) if name.startswith("part-")])
+        tmp_dir = os.path.join(day_dir, f".tmp-{part:05d}")
+        batch.save(tmp_dir)
+        # La parte aparece completa o no aparece
+        os.rename(tmp_dir, os.path.join(day_dir, f"part-{part:05d}"))
+
+    def dates(self) -> List[str]:
+        """Fechas (YYYY-MM-DD) con detecciones archivadas"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if not name.startswith("."))
+
+    def query(self, start: date, end: date) -> FireBatch:
+        """
+        Detecciones archivadas entre dos fechas (inclusive)
+
+        Args:
+            start: Fecha inicial
+            end: Fecha final
+
+        Returns:
+            FireBatch con las detecciones del período
+        """
+        batches = []
+        day = start
+        while day <= end:
+            day_dir = os.path.join(self.root, day.isoformat())
+            if os.path.isdir(day_dir):
+                for part in sorted(os.listdir(day_dir)):
+                    if part.startswith("part-"):
+                        batches.append(FireBatch.load(os.path.join(day_dir, part), mmap=True))
+            day += timedelta(days=1)
+
+        return FireBatch.concat(batches)
+
+
+fire_archive = FireArchive(os.path.join(settings.data_dir, "firms", "archive"))
@@ -0,0 +1,224 @@
+import threading
+import weakref
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from math import cos, radians
+from typing import Dict, List, Tuple
+
+from models.fires import FireBatch
+from services.fire_fusion import detection_minutes
+from utils.geo import KM_PER_DEGREE, pairwise_distances
+
+DEFAULT_EPS_KM = 1.5
+DEFAULT_WINDOW_HOURS = 24
+
+# Eventos ya calculados por batch (se liberan junto con el batch); por batch
+# se guardan solo las últimas combinaciones de parámetros usadas
+_events_memo: "weakref.WeakKeyDictionary[FireBatch, OrderedDict]" = weakref.WeakKeyDictionary()
+EVENTS_MEMO_SIZE = 4
+_events_memo_lock = threading.Lock()
+
+# Máximo de pares (detección, detección) evaluados por bloque de distancias
+PAIR_BLOCK = 1_000_000
+
+
+def cluster_detections(
+    batch: FireBatch,
+    eps_km: float = DEFAULT_EPS_KM,
+    window_hours: float = DEFAULT_WINDOW_HOURS
+) -> np.ndarray:
+    """
+    Agrupa detecciones en eventos de incendio (componentes conexas)
+
+    Dos detecciones quedan conectadas si están a `eps_km` o menos y separadas
+    por `window_hours` o menos; un evento es la clausura transitiva de esas
+    conexiones (estilo DBSCAN con min_samples=1). Solo se comparan pares de
+    celdas vecinas de una grilla de tamaño `eps_km`, no todos contra todos.
+
+    Args:
+        batch: Detecciones a agrupar
+        eps_km: Distancia máxima entre detecciones vecinas
+        window_hours: Separación temporal máxima entre detecciones vecinas
+
+    Returns:
+        Etiqueta de evento (0..k-1) por detección
+    """
+    n = len(batch)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    lats, lons = batch.latitude, batch.longitude
+    minutes = detection_minutes(batch)
+    window_minutes = window_hours * 60
+
+    # Celdas lo bastante anchas en longitud para que los vecinos estén en el 3x3
+    max_lat = min(89.0, float(np.abs(lats).max()) + eps_km / KM_PER_DEGREE)
+    cell_deg = eps_km / (KM_PER_DEGREE * cos(radians(max_lat)))
+    rows = np.floor(lats / cell_deg).astype(np.int64)
+    cols = np.floor(lons / cell_deg).astype(np.int64)
+
+    order = np.lexsort((cols, rows))
+    cell_keys, starts = np.unique(np.column_stack([rows[order], cols[order]]), axis=0, return_index=True)
+    ends = np.append(starts[1:], n)
+    cells = {
+        (int(r), int(c)): order[s:e]
+        for (r, c), s, e in zip(cell_keys.tolist(), starts.tolist(), ends.tolist())
+    }
+
+    # Media vecindad: cada par de celdas se compara una sola vez
+    offsets = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+    edges_i, edges_j = [], []
+    for (row, col), members in cells.items():
+        for dr, dc in offsets:
+            others = cells.get((row + dr, col + dc))
+            if others is None:
+                continue
+
+            # Celdas densas (eps_km grande) se comparan por bloques de filas
+            step = max(1, PAIR_BLOCK // len(others))
+            for start in range(0, len(members), step):
+                block = members[start:start + step]
+                distances = pairwise_distances(lats[block], lons[block], lats[others], lons[others])
+                dt = np.abs(minutes[block][:, np.newaxis] - minutes[others][np.newaxis, :])
+                i, j = np.nonzero((distances <= eps_km) & (dt <= window_minutes))
+                edges_i.append(block[i])
+                edges_j.append(others[j])
+
+    labels = np.arange(n, dtype=np.int64)
+    if edges_i:
+        a = np.concatenate(edges_i)
+        b = np.concatenate(edges_j)
+        # Propagación de la etiqueta mínima + salto de punteros hasta converger
+        while True:
+            smallest = np.minimum(labels[a], labels[b])
+            updated = labels.copy()
+            np.minimum.at(updated, a, smallest)
+            np.minimum.at(updated, b, smallest)
+            while True:
+                jumped = updated[updated]
+                if np.array_equal(jumped, updated):
+                    break
+                updated = jumped
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+
+    return np.unique(labels, return_inverse=True)[1].reshape(-1)
+
+
+def _convex_hull(points: np.ndarray) -> List[List[float]]:
+    """Envolvente convexa (cadena monótona) como anillo [[lon, lat], ...]"""
+    pts = sorted(set(map(tuple, points.tolist())))
+    if len(pts) <= 2:
+        return [list(p) for p in pts]
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower, upper = [], []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+
+    ring = lower[:-1] + upper[:-1]
+    return [list(p) for p in ring + ring[:1]]
+
+
+def _minutes_to_iso(value: int) -> str:
+    day, minute = divmod(int(value), 1440)
+    return datetime.fromordinal(day).replace(hour=minute // 60, minute=minute % 60).isoformat()
+
+
+def summarize_events(batch: FireBatch, labels: np.ndarray) -> List[Dict]:
+    """
+    Resumen de cada evento: centroide, envolvente, FRP total y ventana temporal
+
+    Returns:
+        Lista de eventos; la posición coincide con la etiqueta del evento
+    """
+    if not len(batch):
+        return []
+
+    minutes = detection_minutes(batch)
+    sensors = batch.decode('instrument')
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+
+    events = []
+    for members in np.split(order, bounds):
+        lats, lons = batch.latitude[members], batch.longitude[members]
+        first_seen, last_seen = int(minutes[members].min()), int(minutes[members].max())
+        centroid_lat, centroid_lon = float(lats.mean()), float(lons.mean())
+
+        events.append({
+            "id": f"{_minutes_to_iso(first_seen)}_{centroid_lat:.3f}_{centroid_lon:.3f}",
+            "centroid": {"latitude": round(centroid_lat, 5), "longitude": round(centroid_lon, 5)},
+            "hull": _convex_hull(np.round(np.column_stack([lons, lats]), 5)),
+            "detections": len(members),
+            "total_frp": round(float(np.nansum(batch.frp[members])), 2),
+            "max_brightness": round(float(np.nanmax(batch.brightness[members])), 2),
+            "first_seen": _minutes_to_iso(first_seen),
+            "last_seen": _minutes_to_iso(last_seen),
+            "sensors": sorted(set(sensors[members].tolist()))
+        })
+
+    return events
+
+
+def get_fire_events(
+    batch: FireBatch,
+    eps_km: float = DEFAULT_EPS_KM,
+    window_hours: float = DEFAULT_WINDOW_HOURS
+) -> Tuple[np.ndarray, List[Dict]]:
+    """
+    Etiquetas y resúmenes de eventos de un batch (memorizados por batch)
+
+    Los parámetros se redondean a centésimas para que valores casi iguales
+    compartan resultado.
+
+    Returns:
+        Tupla (etiqueta por detección, lista de eventos)
+    """
+    eps_km, window_hours = round(float(eps_km), 2), round(float(window_hours), 2)
+    key = (eps_km, window_hours)
+    with _events_memo_lock:
+        memo = _events_memo.setdefault(batch, OrderedDict())
+        cached = memo.get(key)
+        if cached is not None:
+            memo.move_to_end(key)
+            return cached
+
+    # El cálculo corre fuera del lock (API y cron pueden pedir eventos a la vez)
+    labels = cluster_detections(batch, eps_km, window_hours)
+    result = (labels, summarize_events(batch, labels))
+    with _events_memo_lock:
+        memo[key] = result
+        memo.move_to_end(key)
+        while len(memo) > EVENTS_MEMO_SIZE:
+            memo.popitem(last=False)
+    return result
+
+
+def nearest_per_event(labels: np.ndarray, indices: np.ndarray, distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce detecciones cercanas a la más próxima de cada evento
+
+    Args:
+        labels: Etiqueta de evento por detección
+        indices: Detecciones candidatas
+        distances: Distancia de cada candidata
+
+    Returns:
+        Tupla (índices, distancias) con una detección por evento, ordenada por distancia
+    """
+    order = np.argsort(distances, kind='stable')
+    indices, distances = indices[order], distances[order]
+    _, first = np.unique(labels[indices], return_index=True)
+    first.sort()
+    return indices[first], distances[first]
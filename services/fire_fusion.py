@@ -0,0 +1,78 @@
+import numpy as np
+from datetime import date
+from itertools import product
+from typing import Sequence
+
+from models.fires import FireBatch
+
+
+def detection_minutes(batch: FireBatch) -> np.ndarray:
+    """Minutos desde la época (ordinal de fecha) de cada detección"""
+    day_ordinals = np.array(
+        [date.fromisoformat(d).toordinal() for d in batch.categories['acq_date']] or [0],
+        dtype=np.int64
+    )
+    hhmm = batch.acq_time.astype(np.int64)
+    return day_ordinals[batch.codes['acq_date']] * 1440 + (hhmm // 100) * 60 + hhmm % 100
+
+
+def fuse_sensor_batches(
+    batches: Sequence[FireBatch],
+    cell_deg: float = 0.01,
+    window_minutes: int = 120
+) -> FireBatch:
+    """
+    Fusiona detecciones de varios sensores en un único conjunto
+
+    Cada detección se asigna a un hash espaciotemporal (celda lat/lon de
+    `cell_deg` grados + bloque de `window_minutes`). Una detección se
+    descarta si en su celda o en las vecinas (3x3), en su bloque o en los
+    contiguos, hay una detección de un sensor de mayor prioridad; así un
+    mismo foco visto por MODIS y VIIRS cuenta una sola vez aunque caiga a
+    ambos lados de un borde, sin comparar pares de detecciones.
+
+    Args:
+        batches: Un batch por sensor, ordenados de mayor a menor prioridad
+        cell_deg: Tamaño de la celda espacial en grados
+        window_minutes: Tamaño del bloque temporal en minutos
+
+    Returns:
+        FireBatch fusionado
+    """
+    priority = np.concatenate([
+        np.full(len(b), rank, dtype=np.int64) for rank, b in enumerate(batches)
+    ] or [np.empty(0, dtype=np.int64)])
+    batch = FireBatch.concat(batches)
+    if len(batch) == 0 or len(batches) == 1:
+        return batch
+
+    keys = np.column_stack([
+        np.floor(batch.latitude / cell_deg).astype(np.int64),
+        np.floor(batch.longitude / cell_deg).astype(np.int64),
+        detection_minutes(batch) // window_minutes
+    ])
+
+    # Hash entero de (fila, columna, bloque) con margen para los vecinos
+    origin = keys.min(axis=0) - 1
+    spans = keys.max(axis=0) - origin + 2
+
+    def encode(k: np.ndarray) -> np.ndarray:
+        k = k - origin
+        return (k[:, 0] * spans[1] + k[:, 1]) * spans[2] + k[:, 2]
+
+    hashes, groups = np.unique(encode(keys), return_inverse=True)
+    groups = groups.reshape(-1)
+    best = np.full(len(hashes), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(best, groups, priority)
+
+    # Mejor prioridad presente en el vecindario de cada detección
+    nearby = best[groups]
+    for offset in product((-1, 0, 1), repeat=3):
+        if offset == (0, 0, 0):
+            continue
+        probe = encode(keys + np.array(offset, dtype=np.int64))
+        positions = np.minimum(np.searchsorted(hashes, probe), len(hashes) - 1)
+        hit = hashes[positions] == probe
+        nearby[hit] = np.minimum(nearby[hit], best[positions[hit]])
+
+    return batch.take(np.flatnonzero(priority <= nearby))
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+from models.fires import FireBatch
+from services.fire_archive import FireArchive, fire_archive
+from services.fire_rollups import FireRollups, fire_rollups
+from services.fire_store import FireDetectionStore, fire_detection_store
+from services.nasa_firms import NASAFIRMSService, nasa_firms_service
+
+
+class FireIngester:
+    """
+    Descarga detecciones de FIRMS y las incorpora al almacén local
+
+    El delta de cada ingesta se agrega al archivo histórico y a los
+    agregados diarios de estadísticas.
+    """
+
+    def __init__(
+        self,
+        firms: NASAFIRMSService,
+        store: FireDetectionStore,
+        archive: FireArchive,
+        rollups: FireRollups
+    ):
+        self.firms = firms
+        self.store = store
+        self.archive = archive
+        self.rollups = rollups
+
+    def ingest(self, days: int = 2) -> FireBatch:
+        """
+        Ingiere la ventana de `days` días de FIRMS
+
+        Args:
+            days: Días hacia atrás a descargar (1-10)
+
+        Returns:
+            FireBatch con las detecciones nuevas de esta ingesta
+        """
+        batch = self.firms.get_fire_batch_sync(days)
+        today = date.today()
+        if batch.source_version is not None and batch.source_version == self.store.source_version:
+            # Misma descarga que la última ingesta: nada que incorporar ni evaluar
+            print("⏭️  FIRMS sin cambios desde la última ingesta")
+            self.rollups.mark_covered(today - timedelta(days=days - 1), today)
+            return FireBatch.empty()
+        
+        delta = self.store.merge(batch)
+        self.archive.append(delta)
+        self.rollups.update(delta)
+        self.rollups.mark_covered(today - timedelta(days=days - 1), today)
+        print(f"📥 {len(delta)} detecciones nuevas de {len(batch)} descargadas")
+        return delta
+
+
+fire_ingester = FireIngester(nasa_firms_service, fire_detection_store, fire_archive, fire_rollups)
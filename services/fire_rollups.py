@@ -0,0 +1,244 @@
+import os
+import threading
+import numpy as np
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from config.settings import get_settings
+from models.fires import FireBatch
+from utils.storage import read_json, write_json_atomic
+
+settings = get_settings()
+
+REGION_DEG = 1.0  # Las regiones son celdas de 1° x 1° (esquina suroeste)
+
+
+def confidence_classes(batch: FireBatch) -> np.ndarray:
+    """
+    Clase de confianza ('low', 'nominal', 'high') de cada detección
+
+    VIIRS publica l/n/h; MODIS publica 0-100 (<30 baja, <80 nominal, resto alta).
+    """
+    labels = []
+    for value in batch.categories['confidence']:
+        value = value.strip().lower()
+        if value in ('h', 'high'):
+            labels.append('high')
+        elif value in ('l', 'low'):
+            labels.append('low')
+        elif value in ('n', 'nominal'):
+            labels.append('nominal')
+        else:
+            try:
+                pct = float(value)
+            except ValueError:
+                labels.append('unknown')
+                continue
+            labels.append('low' if pct < 30 else 'nominal' if pct < 80 else 'high')
+
+    return np.asarray(labels or ['unknown'], dtype=object)[batch.codes['confidence']]
+
+
+def _count(labels: np.ndarray) -> Dict[str, int]:
+    values, counts = np.unique(labels, return_counts=True)
+    return {str(v): int(c) for v, c in zip(values.tolist(), counts.tolist())}
+
+
+class FireRollups:
+    """
+    Agregados diarios de detecciones mantenidos de forma incremental
+
+    Por cada fecha de adquisición se guardan conteos, sumas de brillo y FRP y
+    desgloses por clase de confianza, sensor y región (celda de 1°). Se
+    actualizan con el delta de cada ingesta, así las estadísticas de un
+    período cuestan O(días) sin volver a recorrer detecciones.
+
+    También se registran los días cubiertos por alguna ingesta: un día sin
+    agregado puede no tener incendios o no haber sido ingerido nunca.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._days: Dict[str, Dict] = {}
+        self._covered: set = set()
+        self.updated_at: Optional[str] = None
+        self._mtime = 0.0
+        self._reload_if_changed()
+
+    def _reload_if_changed(self) -> None:
+        """Recarga desde disco si otro proceso (p. ej. el cron) actualizó el archivo"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime > self._mtime:
+            state = read_json(self.path, default={})
+            self._days = state.get("days", {})
+            self._covered = set(state.get("covered_days", []))
+            self.updated_at = state.get("updated_at")
+            self._mtime = mtime
+
+    @classmethod
+    def from_batch(cls, batch: FireBatch) -> "FireRollups":
+        """Agregados en memoria (sin persistir) de un batch"""
+        rollups = cls()
+        rollups.update(batch)
+        return rollups
+
+    def update(self, batch: FireBatch) -> None:
+        """
+        Suma un batch de detecciones nuevas a los agregados
+
+        Args:
+            batch: Detecciones no contadas antes (delta de ingesta)
+        """
+        if not len(batch):
+            return
+
+        confidence = confidence_classes(batch)
+        sensors = batch.decode('instrument') + '/' + batch.decode('satellite')
+        region_rows = np.floor(batch.latitude / REGION_DEG).astype(np.int64)
+        region_cols = np.floor(batch.longitude / REGION_DEG).astype(np.int64)
+
+        with self._lock:
+            self._reload_if_changed()
+            for code, acq_date in enumerate(batch.categories['acq_date']):
+                rows = np.flatnonzero(batch.codes['acq_date'] == code)
+                if not len(rows):
+                    continue
+
+                day = self._days.setdefault(acq_date, {
+                    "count": 0, "brightness_sum": 0.0, "frp_sum": 0.0,
+                    "confidence": {}, "sensor": {}, "region": {}
+                })
+                day["count"] += len(rows)
+                day["brightness_sum"] += float(np.nansum(batch.brightness[rows]))
+                day["frp_sum"] += float(np.nansum(batch.frp[rows]))
+
+                regions = [
+                    f"{r * REGION_DEG:g},{c * REGION_DEG:g}"
+                    for r, c in zip(region_rows[rows].tolist(), region_cols[rows].tolist())
+                ]
+                for key, labels in (
+                    ("confidence", confidence[rows]),
+                    ("sensor", sensors[rows]),
+                    ("region", np.asarray(regions, dtype=object))
+                ):
+                    counts = Counter(day[key])
+                    counts.update(_count(labels))
+                    day[key] = dict(counts)
+
+            self._save()
+
+    def filled_from(self, other: "FireRollups", days: List[date]) -> "FireRollups":
+        """
+        Copia en memoria con los agregados de `other` para `days`
+
+        Args:
+            other: Agregados de otra fuente (p. ej. el archivo histórico)
+            days: Días a tomar de `other`, normalmente los no cubiertos
+
+        Returns:
+            Nuevos agregados sin persistir
+        """
+        with self._lock:
+            self._reload_if_changed()
+            merged = FireRollups()
+            merged._days = dict(self._days)
+            merged._covered = set(self._covered)
+        for day in days:
+            rollup = other._days.get(day.isoformat())
+            if rollup:
+                merged._days[day.isoformat()] = rollup
+        merged.updated_at = self.updated_at
+        return merged
+
+    def mark_covered(self, start: date, end: date) -> None:
+        """
+        Registra que una ingesta cubrió el período (inclusive)
+
+        Args:
+            start: Primer día de la ventana descargada
+            end: Último día de la ventana descargada
+        """
+        with self._lock:
+            self._reload_if_changed()
+            day = start
+            while day <= end:
+                self._covered.add(day.isoformat())
+                day += timedelta(days=1)
+            self._save()
+
+    def uncovered_days(self, start: date, end: date) -> List[date]:
+        """Días del período (inclusive) que ninguna ingesta cubrió"""
+        with self._lock:
+            self._reload_if_changed()
+            missing = []
+            day = start
+            while day <= end:
+                # Los días con agregado se ingirieron aunque no se hayan marcado
+                if day.isoformat() not in self._covered and day.isoformat() not in self._days:
+                    missing.append(day)
+                day += timedelta(days=1)
+            return missing
+
+    def _save(self) -> None:
+        self.updated_at = datetime.now().isoformat()
+        if self.path:
+            write_json_atomic(self.path, {
+                "days": self._days,
+                "covered_days": sorted(self._covered),
+                "updated_at": self.updated_at
+            })
+            self._mtime = os.path.getmtime(self.path)
+
+    def summary(self, start: date, end: date, include_regions: bool = False) -> Dict:
+        """
+        Estadísticas de un período sumando los agregados diarios
+
+        Args:
+            start: Fecha inicial (inclusive)
+            end: Fecha final (inclusive)
+            include_regions: Incluir desglose por región
+
+        Returns:
+            Dict con totales y desgloses del período
+        """
+        total = 0
+        brightness_sum = 0.0
+        frp_sum = 0.0
+        by_date = {}
+        by_confidence, by_sensor, by_region = Counter(), Counter(), Counter()
+
+        with self._lock:
+            self._reload_if_changed()
+            day = start
+            while day <= end:
+                rollup = self._days.get(day.isoformat())
+                if rollup:
+                    total += rollup["count"]
+                    brightness_sum += rollup["brightness_sum"]
+                    frp_sum += rollup["frp_sum"]
+                    by_date[day.isoformat()] = rollup["count"]
+                    by_confidence.update(rollup["confidence"])
+                    by_sensor.update(rollup["sensor"])
+                    if include_regions:
+                        by_region.update(rollup["region"])
+                day += timedelta(days=1)
+
+        summary = {
+            "total_fires": total,
+            "high_confidence_fires": by_confidence.get("high", 0),
+            "average_brightness": round(brightness_sum / total, 2) if total else None,
+            "total_frp": round(frp_sum, 2),
+            "fires_by_date": by_date,
+            "fires_by_confidence": dict(by_confidence),
+            "fires_by_sensor": dict(by_sensor),
+        }
+        if include_regions:
+            summary["fires_by_region"] = dict(by_region.most_common())
+        return summary
+
+
+fire_rollups = FireRollups(os.path.join(settings.data_dir, "firms", "rollups.json"))
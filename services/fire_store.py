@@ -0,0 +1,126 @@
+import os
+import threading
+import numpy as np
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+from config.settings import get_settings
+from models.fires import FireBatch
+from utils.storage import read_array, read_json, write_array_atomic, write_json_atomic
+
+settings = get_settings()
+
+
+class FireDetectionStore:
+    """
+    Almacén local de detecciones recientes de FIRMS
+
+    Guarda las detecciones de los últimos `retention_days` días sin duplicados,
+    usando como clave (lat, lon, acq_date, acq_time, satellite). Cada merge
+    numera las filas nuevas con una secuencia creciente y cada consumidor
+    (alertas, estadísticas...) lleva su propio cursor, de modo que puede pedir
+    solo lo nuevo desde su última ejecución.
+    """
+
+    def __init__(self, path: str, retention_days: int = 10):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+
+        self._batch = FireBatch.load(os.path.join(path, "batch"))
+        seq = read_array(os.path.join(path, "seq.npy"))
+        self._seq = seq if seq is not None and len(seq) == len(self._batch) else np.zeros(len(self._batch), dtype=np.int64)
+
+        state = read_json(os.path.join(path, "state.json"), default={})
+        self._last_seq: int = state.get("last_seq", 0)
+        self._cursors: Dict[str, int] = state.get("cursors", {})
+        # Huella de la última descarga incorporada (ver FireBatch.source_version)
+        self.source_version: Optional[str] = state.get("source_version")
+        self._keys = set(self._batch.keys())
+
+    def __len__(self) -> int:
+        return len(self._batch)
+
+    def merge(self, batch: FireBatch) -> FireBatch:
+        """
+        Incorpora una descarga y devuelve solo las detecciones nuevas
+
+        Args:
+            batch: Detecciones descargadas de FIRMS
+
+        Returns:
+            FireBatch con las detecciones que no estaban en el almacén
+        """
+        with self._lock:
+            cutoff = self._cutoff()
+            new_rows = []
+            for i, key in enumerate(batch.keys()):
+                # key[2] = acq_date; lo anterior a la retención no se almacena
+                if key[2] >= cutoff and key not in self._keys:
+                    self._keys.add(key)
+                    new_rows.append(i)
+
+            delta = batch.take(new_rows)
+            if len(delta):
+                self._last_seq += 1
+                self._batch = FireBatch.concat([self._batch, delta])
+                self._seq = np.concatenate([self._seq, np.full(len(delta), self._last_seq, dtype=np.int64)])
+
+            changed = batch.source_version is not None and batch.source_version != self.source_version
+            if changed:
+                self.source_version = batch.source_version
+
+            pruned = self._prune()
+            if len(delta) or pruned:
+                self._save()
+            elif changed:
+                self._save_state()
+
+            return delta
+
+    def changes_since(self, consumer: str) -> Tuple[FireBatch, int]:
+        """
+        Detecciones nuevas desde el último `commit` del consumidor
+
+        Returns:
+            Tupla (detecciones, secuencia a confirmar con `commit`)
+        """
+        with self._lock:
+            cursor = self._cursors.get(consumer, 0)
+            return self._batch.take(np.flatnonzero(self._seq > cursor)), self._last_seq
+
+    def commit(self, consumer: str, seq: int) -> None:
+        """Marca como procesadas las detecciones hasta `seq` para el consumidor"""
+        with self._lock:
+            self._cursors[consumer] = seq
+            self._save_state()
+
+    def _cutoff(self) -> str:
+        return (date.today() - timedelta(days=self.retention_days)).isoformat()
+
+    def _prune(self) -> bool:
+        """Descarta detecciones fuera de la ventana de retención"""
+        keep = self._batch.decode('acq_date') >= self._cutoff()
+        if keep.all():
+            return False
+
+        kept = np.flatnonzero(keep)
+        self._batch = self._batch.take(kept)
+        self._seq = self._seq[kept]
+        self._keys = set(self._batch.keys())
+        return True
+
+    def _save(self) -> None:
+        self._batch.save(os.path.join(self.path, "batch"))
+        write_array_atomic(os.path.join(self.path, "seq.npy"), self._seq)
+        self._save_state()
+
+    def _save_state(self) -> None:
+        write_json_atomic(os.path.join(self.path, "state.json"), {
+            "last_seq": self._last_seq,
+            "cursors": self._cursors,
+            "source_version": self.source_version
+        })
+
+
+fire_detection_store = FireDetectionStore(os.path.join(settings.data_dir, "firms", "store"))
@@ -0,0 +1,253 @@
+import os
+import threading
+import numpy as np
+from datetime import datetime, timedelta
+from math import cos, floor, radians
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import get_settings
+from models.fires import FireBatch
+from utils.geo import KM_PER_DEGREE, haversine_km
+from utils.storage import read_json, write_json_atomic
+
+settings = get_settings()
+
+# Radio de alerta alrededor de cada bosque adoptado
+ALERT_RADIUS_KM = 20
+
+# Reconstrucción completa periódica (p. ej. coordenadas de un bosque editadas)
+REBUILD_AFTER = timedelta(hours=24)
+
+
+class GeofenceIndex:
+    """
+    Índice de suscripciones: celdas de grilla → adopciones activas
+
+    Cada adopción se registra en todas las celdas que cubren el círculo de
+    alerta alrededor de su bosque. Encontrar a los suscriptores de una
+    detección es buscar su celda, sin consultar `adopted_forests`.
+
+    Se persiste como JSON (solo las suscripciones; las celdas se derivan al
+    cargar), se actualiza al adoptar / desactivar y se recarga si otro
+    proceso modificó el archivo. El cron compara en cada corrida los ids de
+    las adopciones activas (consulta liviana, sin `forests`) y solo carga
+    las nuevas; el índice completo se reconstruye cada REBUILD_AFTER.
+    """
+
+    def __init__(self, path: str, radius_km: float = 20, cell_deg: float = 0.25):
+        self.path = path
+        self.radius_km = radius_km
+        self.cell_deg = cell_deg
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, Dict] = {}
+        self._cells: Dict[Tuple[int, int], List[str]] = {}
+        self.built_at: Optional[str] = None
+        self._mtime = 0.0
+        self._reload_if_changed()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def _reload_if_changed(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime > self._mtime:
+            state = read_json(self.path, default={})
+            self._subscriptions = state.get("subscriptions", {})
+            self.built_at = state.get("built_at")
+            self._mtime = mtime
+            self._index_cells()
+
+    def _save(self) -> None:
+        write_json_atomic(self.path, {"subscriptions": self._subscriptions, "built_at": self.built_at})
+        self._mtime = os.path.getmtime(self.path)
+
+    def _covering_cells(self, lat: float, lon: float):
+        dlat = self.radius_km / KM_PER_DEGREE
+        dlon = self.radius_km / (KM_PER_DEGREE * cos(radians(min(89.9, abs(lat) + dlat))))
+        for row in range(floor((lat - dlat) / self.cell_deg), floor((lat + dlat) / self.cell_deg) + 1):
+            for col in range(floor((lon - dlon) / self.cell_deg), floor((lon + dlon) / self.cell_deg) + 1):
+                yield row, col
+
+    def _index_cells(self) -> None:
+        cells: Dict[Tuple[int, int], List[str]] = {}
+        for adoption_id, sub in self._subscriptions.items():
+            for cell in self._covering_cells(sub['latitude'], sub['longitude']):
+                cells.setdefault(cell, []).append(adoption_id)
+        self._cells = cells
+
+    @staticmethod
+    def _subscription(adoption: Dict, forest: Dict) -> Dict:
+        return {
+            'adoption_id': str(adoption['id']),
+            'forest_id': adoption['forest_id'],
+            'forest_name': forest['name'],
+            'guardian_email': adoption['guardian_email'],
+            'guardian_name': adoption['guardian_name'],
+            'latitude': float(forest['latitude']),
+            'longitude': float(forest['longitude'])
+        }
+
+    def rebuild(self, adoptions: List[Dict]) -> None:
+        """
+        Reconstruye el índice completo
+
+        Args:
+            adoptions: Adopciones activas con el bosque embebido (`forests(*)`)
+        """
+        with self._lock:
+            self._subscriptions = {
+                str(a['id']): self._subscription(a, a['forests'])
+                for a in adoptions if a.get('forests')
+            }
+            self.built_at = datetime.now().isoformat()
+            self._index_cells()
+            self._save()
+        print(f"🗺️  Geofence reconstruido: {len(self._subscriptions)} adopciones")
+
+    def ensure_fresh(self, load_adoptions: Callable[[], List[Dict]]) -> None:
+        """Reconstruye si el índice no existe o tiene más de REBUILD_AFTER"""
+        with self._lock:
+            self._reload_if_changed()
+            built_at = datetime.fromisoformat(self.built_at) if self.built_at else None
+        if built_at is None or datetime.now() - built_at > REBUILD_AFTER:
+            self.rebuild(load_adoptions())
+
+    def sync(
+        self,
+        active_ids: Iterable,
+        load_adoptions: Callable[[List[str]], List[Dict]]
+    ) -> Tuple[int, int]:
+        """
+        Aplica las altas y bajas hechas fuera de la API
+
+        Args:
+            active_ids: Ids de todas las adopciones activas
+            load_adoptions: ids → adopciones con el bosque embebido
+
+        Returns:
+            Tupla (adopciones agregadas, adopciones quitadas)
+        """
+        active = {str(adoption_id) for adoption_id in active_ids}
+        with self._lock:
+            self._reload_if_changed()
+            known = set(self._subscriptions)
+        added, removed = sorted(active - known), sorted(known - active)
+
+        if removed:
+            self.remove_many(removed)
+        if added:
+            self.add_many(load_adoptions(added))
+        return len(added), len(removed)
+
+    def add(self, adoption: Dict, forest: Dict) -> None:
+        """Registra una adopción nueva"""
+        self.add_many([{**adoption, 'forests': forest}])
+
+    def add_many(self, adoptions: List[Dict]) -> None:
+        """
+        Registra (o actualiza) adopciones
+
+        Args:
+            adoptions: Adopciones activas con el bosque embebido (`forests(*)`)
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if self.built_at is None:
+                return  # Aún no construido: la primera reconstrucción las incluirá
+            reindex = False
+            for adoption in adoptions:
+                if not adoption.get('forests'):
+                    continue
+                sub = self._subscription(adoption, adoption['forests'])
+                if self._subscriptions.get(sub['adoption_id']) is not None:
+                    reindex = True  # Ya registrada: sus celdas pueden cambiar
+                else:
+                    for cell in self._covering_cells(sub['latitude'], sub['longitude']):
+                        self._cells.setdefault(cell, []).append(sub['adoption_id'])
+                self._subscriptions[sub['adoption_id']] = sub
+            if reindex:
+                self._index_cells()
+            self._save()
+
+    def remove(self, adoption_id: str) -> None:
+        """Elimina una adopción desactivada"""
+        self.remove_many([adoption_id])
+
+    def remove_many(self, adoption_ids: Iterable) -> None:
+        """Elimina adopciones desactivadas"""
+        with self._lock:
+            self._reload_if_changed()
+            removed = [self._subscriptions.pop(str(a), None) for a in adoption_ids]
+            if any(sub is not None for sub in removed):
+                self._index_cells()
+                self._save()
+
+    def match(self, fires: FireBatch) -> List[Tuple[Dict, np.ndarray, np.ndarray]]:
+        """
+        Suscripciones con detecciones dentro del radio de alerta
+
+        Args:
+            fires: Detecciones a evaluar
+
+        Returns:
+            Lista de (suscripción, índices, distancias_km), con las
+            detecciones de cada suscripción ordenadas por distancia
+        """
+        with self._lock:
+            self._reload_if_changed()
+            cells, subscriptions = self._cells, self._subscriptions
+
+        if not len(fires) or not cells:
+            return []
+
+        rows = np.floor(fires.latitude / self.cell_deg).astype(np.int64)
+        cols = np.floor(fires.longitude / self.cell_deg).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        keys, starts = np.unique(np.column_stack([rows[order], cols[order]]), axis=0, return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        # Pares candidatos (suscripción, detección) de las celdas con suscriptores
+        sub_ids: List[str] = []
+        pair_subs, pair_fires = [], []
+        sub_position: Dict[str, int] = {}
+        for (row, col), start, end in zip(keys.tolist(), starts.tolist(), ends.tolist()):
+            adoption_ids = cells.get((row, col))
+            if not adoption_ids:
+                continue
+            positions = []
+            for adoption_id in adoption_ids:
+                if adoption_id not in sub_position:
+                    sub_position[adoption_id] = len(sub_ids)
+                    sub_ids.append(adoption_id)
+                positions.append(sub_position[adoption_id])
+            members = order[start:end]
+            pair_subs.append(np.repeat(positions, len(members)))
+            pair_fires.append(np.tile(members, len(positions)))
+
+        if not pair_subs:
+            return []
+
+        pair_subs, pair_fires = np.concatenate(pair_subs), np.concatenate(pair_fires)
+        sub_lats = np.array([subscriptions[a]['latitude'] for a in sub_ids])
+        sub_lons = np.array([subscriptions[a]['longitude'] for a in sub_ids])
+        distances = haversine_km(
+            sub_lats[pair_subs], sub_lons[pair_subs],
+            fires.latitude[pair_fires], fires.longitude[pair_fires]
+        )
+
+        within = distances <= self.radius_km
+        pair_subs, pair_fires, distances = pair_subs[within], pair_fires[within], distances[within]
+        order = np.lexsort((distances, pair_subs))
+        pair_subs, pair_fires, distances = pair_subs[order], pair_fires[order], distances[order]
+
+        positions, starts = np.unique(pair_subs, return_index=True)
+        ends = np.append(starts[1:], len(pair_subs))
+        return [
+            (subscriptions[sub_ids[position]], pair_fires[start:end], distances[start:end])
+            for position, start, end in zip(positions.tolist(), starts.tolist(), ends.tolist())
+        ]
+
+
+geofence_index = GeofenceIndex(os.path.join(settings.data_dir, "geofence.json"), radius_km=ALERT_RADIUS_KM)
@@ -0,0 +1,186 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 en httpx si está instalado)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Errores en los que el request nunca llegó al servidor (seguro reintentar un POST)
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class HTTPClientPool:
+    """
+    Clientes HTTP compartidos para todas las integraciones salientes
+
+    - Un `httpx.AsyncClient` con keep-alive (y HTTP/2 si `h2` está instalado)
+      para los endpoints async de la API.
+    - Un `httpx.Client` equivalente solo para el cron / CLI síncrono.
+    - Límite de conexiones simultáneas por host, timeouts y reintentos con
+      backoff exponencial.
+
+    Los métodos no idempotentes (POST...) solo se reintentan ante 429 o si la
+    conexión no llegó a establecerse, para no duplicar envíos.
+    """
+
+    def __init__(self, max_retries: int = 2, backoff_seconds: float = 0.5, max_per_host: int = 10):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_per_host = max_per_host
+
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._sync_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=DEFAULT_TIMEOUT,
+                limits=DEFAULT_LIMITS
+            )
+        return self._async_client
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    timeout=DEFAULT_TIMEOUT,
+                    limits=DEFAULT_LIMITS
+                )
+            return self._sync_client
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        on_retry: Optional[Callable[[], None]] = None,
+        max_retries: Optional[int] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Request async con límite por host y reintentos
+
+        Args:
+            on_retry: Se llama antes de cada reintento (p. ej. para contar la
+                transacción contra una cuota)
+            max_retries: Reintentos de este request (por defecto los del pool;
+                0 si el llamador maneja sus propios reintentos)
+
+        Returns:
+            Respuesta final (no llama a raise_for_status)
+        """
+        host = urlsplit(url).netloc
+        limit = self._async_host_limits.get(host)
+        if limit is None:
+            limit = self._async_host_limits[host] = asyncio.Semaphore(self.max_per_host)
+
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        for attempt in range(max_retries + 1):
+            try:
+                async with limit:
+                    response = await self.async_client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if not self._should_retry_error(method, e, attempt, max_retries):
+                    raise
+            else:
+                if not self._should_retry_status(method, response.status_code, attempt, max_retries):
+                    return response
+            await asyncio.sleep(self._backoff(attempt))
+            if on_retry is not None:
+                on_retry()
+
+    def request_sync(
+        self,
+        method: str,
+        url: str,
+        on_retry: Optional[Callable[[], None]] = None,
+        max_retries: Optional[int] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Request síncrono (cron / CLI) con límite por host y reintentos
+
+        Args:
+            on_retry: Se llama antes de cada reintento (p. ej. para contar la
+                transacción contra una cuota)
+            max_retries: Reintentos de este request (por defecto los del pool;
+                0 si el llamador maneja sus propios reintentos)
+
+        Returns:
+            Respuesta final (no llama a raise_for_status)
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            limit = self._sync_host_limits.get(host)
+            if limit is None:
+                limit = self._sync_host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        for attempt in range(max_retries + 1):
+            try:
+                with limit:
+                    response = self.sync_client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if not self._should_retry_error(method, e, attempt, max_retries):
+                    raise
+            else:
+                if not self._should_retry_status(method, response.status_code, attempt, max_retries):
+                    return response
+            time.sleep(self._backoff(attempt))
+            if on_retry is not None:
+                on_retry()
+
+    async def aclose(self) -> None:
+        """Cierra los clientes (shutdown de la app)"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+    def _should_retry_error(self, method: str, error: httpx.TransportError, attempt: int, max_retries: int) -> bool:
+        if attempt >= max_retries:
+            return False
+        return _is_idempotent(method) or isinstance(error, _NOT_SENT_ERRORS)
+
+    def _should_retry_status(self, method: str, status_code: int, attempt: int, max_retries: int) -> bool:
+        if attempt >= max_retries or status_code not in RETRY_STATUS_CODES:
+            return False
+        return _is_idempotent(method) or status_code == 429
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+
+
+def _is_idempotent(method: str) -> bool:
+    return method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+# Instancia global
+http_pool = HTTPClientPool()
@@ -0,0 +1,154 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+
+class Job:
+    """
+    Estado de un trabajo en segundo plano
+
+    La tarea marca sus etapas con `stage(nombre)` (cada llamada cierra la
+    etapa anterior) y publica contadores con `count(nombre, valor)`; ambos
+    quedan visibles mientras el trabajo corre. `on_stage`, si se define, se
+    llama al inicio de cada etapa y puede abortar el trabajo lanzando una
+    excepción.
+    """
+
+    def __init__(self, name: str, key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.key = key
+        self.coalesced = 0
+        self.state = "queued"
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stage: Optional[str] = None
+        self._stage_started = 0.0
+        self.on_stage: Optional[Callable[[str], None]] = None
+
+    def stage(self, name: str) -> None:
+        """Inicia una etapa (y cierra la anterior)"""
+        if self.on_stage is not None:
+            self.on_stage(name)
+        with self._lock:
+            self._close_stage()
+            self._stage = name
+            self._stage_started = time.perf_counter()
+
+    def end_stage(self) -> None:
+        """Cierra la etapa en curso (para tareas ejecutadas fuera de `JobRunner`)"""
+        with self._lock:
+            self._close_stage()
+
+    def count(self, name: str, value: int) -> None:
+        with self._lock:
+            self.counts[name] = int(value)
+
+    def _close_stage(self) -> None:
+        if self._stage is not None:
+            elapsed = time.perf_counter() - self._stage_started
+            self.stages[self._stage] = round(self.stages.get(self._stage, 0.0) + elapsed, 3)
+            self._stage = None
+
+    def _run(self, fn: Callable, *args, **kwargs) -> None:
+        self.state = "running"
+        self.started_at = datetime.now().isoformat()
+        try:
+            self.result = fn(*args, job=self, **kwargs)
+            self.state = "succeeded"
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            traceback.print_exc()
+        finally:
+            self.end_stage()
+            self.finished_at = datetime.now().isoformat()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            stages = dict(self.stages)
+            if self._stage is not None:
+                stages[self._stage] = round(
+                    stages.get(self._stage, 0.0) + time.perf_counter() - self._stage_started, 3
+                )
+            return {
+                "id": self.id,
+                "name": self.name,
+                "key": self.key,
+                "state": self.state,
+                "coalesced_triggers": self.coalesced,
+                "current_stage": self._stage,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "stages_seconds": stages,
+                "counts": dict(self.counts),
+                "result": self.result,
+                "error": self.error
+            }
+
+
+class JobRunner:
+    """
+    Ejecuta tareas bloqueantes en un pool de hilos propio del proceso
+
+    Los endpoints encolan la tarea y responden al instante con el id del
+    trabajo; el event loop de la API nunca ejecuta la tarea. Se conserva el
+    estado de los últimos `max_history` trabajos para consultarlo. Con un
+    hilo por clave, una tarea lenta no demora a las de otra clave.
+    """
+
+    def __init__(self, max_workers: int = 1, max_history: int = 100):
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable, *args, key: Optional[str] = None, **kwargs) -> Job:
+        """
+        Encola `fn(*args, job=job, **kwargs)`
+
+        Args:
+            key: Si hay un trabajo pendiente o en curso con la misma clave, no
+                se encola otro: se devuelve ese (disparos superpuestos se
+                fusionan en una sola ejecución)
+
+        Returns:
+            Job nuevo (estado "queued") o el trabajo activo con la misma clave
+        """
+        with self._lock:
+            if key is not None:
+                for active in self._jobs.values():
+                    if active.key == key and active.state in ("queued", "running"):
+                        active.coalesced += 1
+                        return active
+
+            job = Job(name, key=key)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+        self._executor.submit(job._run, fn, *args, **kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+# Instancia global: un hilo por tarea del cron (check-fires y
+# refresh-ndvi-tile); la clave evita que una misma tarea se superponga
+job_runner = JobRunner(max_workers=2)
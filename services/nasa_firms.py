@@ -1,19 +1,164 @@
-import requests
-from typing import List, Dict
+import asyncio
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Sequence, Tuple
+import httpx
 from config.settings import get_settings
+from models.fires import FireBatch
+from services.fire_events import get_fire_events, nearest_per_event
+from services.fire_fusion import fuse_sensor_batches
+from services.http_client import http_pool
+from utils.cache import TTLCache
 
 settings = get_settings()
 
+# Coordenadas de Perú: oeste, sur, este, norte
+PERU_BOUNDS = "-81.3,-18.3,-68.7,-0.0"
+
+# Ventana máxima que sirve la API de área de FIRMS
+FIRMS_MAX_DAYS = 10
+
+# FIRMS limita las transacciones por key en ventanas de 10 minutos
+FIRMS_WINDOW_SECONDS = 600
+
+# Respuestas de FIRMS (HTTP 200) que indican una key agotada o inválida
+FIRMS_KEY_ERRORS = (b"Exceeding allowed transaction limit", b"Invalid MAP_KEY", b"Invalid API call")
+
+PRIORITY_CRON = "cron"
+PRIORITY_INTERACTIVE = "interactive"
+
+
+class FIRMSUnavailableError(Exception):
+    """FIRMS no disponible (sin presupuesto o sin respuesta) y sin datos cacheados"""
+
+
+class FIRMSBudget:
+    """
+    Presupuesto de transacciones de FIRMS para un pool de API keys
+    
+    Cada llamada a FIRMS (reintentos incluidos) se registra en la key usada;
+    el consumo de una key es la cantidad de llamadas en los últimos
+    `window_seconds`. El tráfico interactivo solo usa hasta
+    `limit * (1 - reserve)` por key: el resto queda para el cron y las
+    alertas. Las transacciones se reparten hacia la key con más margen.
+    """
+    
+    def __init__(
+        self,
+        keys: Sequence[str],
+        limit: int,
+        window_seconds: float = FIRMS_WINDOW_SECONDS,
+        reserve: float = 0.2
+    ):
+        self.keys = list(dict.fromkeys(k for k in keys if k))
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.reserve = reserve
+        self._calls = {key: deque() for key in self.keys}
+        self._blocked_until = {key: 0.0 for key in self.keys}
+        self._lock = threading.Lock()
+    
+    def _used(self, key: str, now: float) -> int:
+        calls = self._calls[key]
+        while calls and calls[0] <= now - self.window_seconds:
+            calls.popleft()
+        return len(calls)
+    
+    def _allowance(self, priority: str) -> int:
+        if priority == PRIORITY_CRON:
+            return self.limit
+        return int(self.limit * (1 - self.reserve))
+    
+    def acquire(self, count: int, priority: str = PRIORITY_INTERACTIVE) -> List[str]:
+        """
+        Reserva `count` transacciones (todas o ninguna)
+        
+        Returns:
+            La key a usar en cada transacción
+        
+        Raises:
+            FIRMSUnavailableError: Si el pool no tiene margen para `priority`
+        """
+        now = time.monotonic()
+        with self._lock:
+            allowance = self._allowance(priority)
+            free = {
+                key: allowance - self._used(key, now)
+                for key in self.keys if self._blocked_until[key] <= now
+            }
+            if sum(max(0, n) for n in free.values()) < count:
+                raise FIRMSUnavailableError(f"Presupuesto de FIRMS agotado para tráfico {priority}")
+            
+            keys = []
+            for _ in range(count):
+                key = max(free, key=free.get)
+                free[key] -= 1
+                self._calls[key].append(now)
+                keys.append(key)
+            return keys
+    
+    def charge(self, key: str) -> None:
+        """Registra una transacción no reservada (reintento)"""
+        with self._lock:
+            self._calls[key].append(time.monotonic())
+    
+    def block(self, key: str) -> None:
+        """Saca una key del pool por una ventana (FIRMS la rechazó)"""
+        with self._lock:
+            self._blocked_until[key] = time.monotonic() + self.window_seconds
+    
+    def status(self) -> Dict:
+        """Consumo por key (keys enmascaradas)"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "limit_per_key": self.limit,
+                "window_seconds": self.window_seconds,
+                "cron_reserve": self.reserve,
+                "keys": [
+                    {
+                        "key": f"...{key[-4:]}",
+                        "used": self._used(key, now),
+                        "blocked": self._blocked_until[key] > now
+                    }
+                    for key in self.keys
+                ]
+            }
+
+
 class NASAFIRMSService:
     """Servicio para obtener datos de incendios de NASA FIRMS API"""
     
     def __init__(self):
         self.api_key = settings.nasa_firms_api_key
+        self.budget = FIRMSBudget(
+            [self.api_key, *(k.strip() for k in settings.nasa_firms_api_keys.split(','))],
+            limit=settings.firms_transaction_limit,
+            reserve=settings.firms_cron_reserve
+        )
         self.base_url = "https://firms.modaps.eosdis.nasa.gov/api"
+        # Sensores en orden de prioridad para la fusión (VIIRS 375 m antes que MODIS 1 km)
+        self.sensors = tuple(s.strip() for s in settings.firms_sensors.split(',') if s.strip())
+        self.source = "NASA FIRMS - " + " + ".join(self.sensors)
+        # Los datos NRT de FIRMS cambian cada pocas horas: una descarga compartida
+        # por (sensores, área, días) atiende a todos los usuarios y al cron
+        self._cache = TTLCache(
+            ttl_seconds=settings.firms_cache_ttl_seconds,
+            stale_seconds=settings.firms_cache_stale_seconds
+        )
+        # Última respuesta por (sensor, área, días): validadores HTTP, sha256 y
+        # batch decodificado, para no re-decodificar un CSV que no cambió
+        self._payloads: Dict[Tuple, Dict] = {}
+        # Último batch fusionado por días (se reutiliza si ningún sensor cambió)
+        self._fused: Dict[int, FireBatch] = {}
+        self._lock = threading.Lock()
     
-    def get_fires_peru(self, days: int = 1) -> List[Dict]:
+    async def get_fires_peru(self, days: int = 1) -> List[Dict]:
         """
-        Obtiene incendios activos en Perú usando MODIS
+        Obtiene incendios activos en Perú (MODIS + VIIRS fusionados)
         
         Args:
             days: Número de días hacia atrás (1-10)
@@ -21,57 +166,209 @@ class NASAFIRMSService:
         Returns:
             Lista de incendios
         """
+        batch = await self.get_fire_batch(days)
+        return batch.to_dicts()
+    
+    async def get_fire_batch(self, days: int = 1, priority: str = PRIORITY_INTERACTIVE) -> FireBatch:
+        """
+        Detecciones de Perú en formato columnar (cacheadas)
+        
+        Args:
+            days: Número de días hacia atrás (1-10)
+            priority: Prioridad frente al presupuesto de FIRMS
+        
+        Returns:
+            FireBatch compartido por la caché; si FIRMS falla o no hay
+            presupuesto, el último batch conocido aunque esté vencido
+        
+        Raises:
+            FIRMSUnavailableError: Si FIRMS falla y no hay datos cacheados
+        """
+        key = (self.sensors, PERU_BOUNDS, days)
         try:
-            # Coordenadas de Perú: oeste, sur, este, norte
-            peru_bounds = "-81.3,-18.3,-68.7,-0.0"
-            
-            url = f"{self.base_url}/area/csv/{self.api_key}/MODIS_NRT/{peru_bounds}/{days}"
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # Procesar CSV
-            lines = response.text.strip().split('\n')
-            
-            if len(lines) < 2:
-                return []
-            
-            fires = []
-            for line in lines[1:]:  # Saltar header
-                if not line.strip():
-                    continue
-                
-                try:
-                    values = line.split(',')
-                    
-                    fire = {
-                        'latitude': float(values[0]),
-                        'longitude': float(values[1]),
-                        'brightness': float(values[2]),
-                        'scan': float(values[3]),
-                        'track': float(values[4]),
-                        'acq_date': values[5],
-                        'acq_time': values[6],
-                        'satellite': values[7],
-                        'instrument': values[8],
-                        'confidence': values[9],
-                        'version': values[10],
-                        'bright_t31': float(values[11]),
-                        'frp': float(values[12]),
-                        'daynight': values[13]
-                    }
-                    
-                    fires.append(fire)
-                except (ValueError, IndexError) as e:
-                    continue
-            
-            return fires
-            
+            return await self._cache.aget_or_load(key, lambda: self._load_fused(days, priority))
         except Exception as e:
-            print(f"Error al obtener incendios: {str(e)}")
-            return []
+            return self._fallback(key, e)
+    
+    def get_fire_batch_sync(self, days: int = 1, priority: str = PRIORITY_CRON) -> FireBatch:
+        """Versión síncrona de `get_fire_batch` (solo para el cron / CLI)"""
+        key = (self.sensors, PERU_BOUNDS, days)
+        try:
+            return self._cache.get_or_load(key, lambda: self._load_fused_sync(days, priority))
+        except Exception as e:
+            return self._fallback(key, e)
+    
+    def _fallback(self, key: Tuple, error: Exception) -> FireBatch:
+        """Último batch conocido de la clave, o FIRMSUnavailableError"""
+        stale = self._cache.peek(key)
+        if stale is not None:
+            print(f"⚠️ FIRMS no disponible ({error}); sirviendo datos cacheados")
+            return stale
+        print(f"Error al obtener incendios: {str(error)}")
+        if isinstance(error, FIRMSUnavailableError):
+            raise error
+        raise FIRMSUnavailableError(str(error)) from error
     
-    def get_fires_near_location(
+    async def _load_fused(self, days: int, priority: str) -> FireBatch:
+        """Descarga todos los sensores en paralelo y fusiona sus detecciones"""
+        api_keys = self.budget.acquire(len(self.sensors), priority)
+        results = await asyncio.gather(
+            *(
+                self._download_fires(sensor, PERU_BOUNDS, days, api_key)
+                for sensor, api_key in zip(self.sensors, api_keys)
+            ),
+            return_exceptions=True
+        )
+        return await asyncio.to_thread(self._fuse, days, results)
+    
+    def _load_fused_sync(self, days: int, priority: str) -> FireBatch:
+        """Versión síncrona de `_load_fused` (un hilo por sensor)"""
+        api_keys = self.budget.acquire(len(self.sensors), priority)
+        
+        def download(sensor: str, api_key: str):
+            try:
+                return self._download_fires_sync(sensor, PERU_BOUNDS, days, api_key)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=len(self.sensors)) as executor:
+            results = list(executor.map(download, self.sensors, api_keys))
+        return self._fuse(days, results)
+    
+    def _fuse(self, days: int, results: Sequence) -> FireBatch:
+        """
+        Fusiona los batches de los sensores que respondieron
+        
+        Si todos los sensores devolvieron el mismo contenido que en el
+        refresco anterior se reutiliza el batch fusionado (y su índice).
+        """
+        batches = []
+        digests = []
+        for sensor, result in zip(self.sensors, results):
+            if isinstance(result, BaseException):
+                print(f"⚠️ Error al obtener incendios de {sensor}: {result}")
+                digests.append(f"{sensor}:error")
+            else:
+                digest, sensor_batch = result
+                batches.append(sensor_batch)
+                digests.append(f"{sensor}:{digest}")
+        
+        if not batches:
+            raise RuntimeError("Ningún sensor de FIRMS respondió")
+        
+        version = hashlib.sha256("|".join(digests).encode()).hexdigest()
+        previous = self._fused.get(days)
+        if previous is not None and previous.source_version == version:
+            return previous
+        
+        batch = fuse_sensor_batches(
+            batches,
+            cell_deg=settings.firms_fusion_cell_deg,
+            window_minutes=settings.firms_fusion_window_minutes
+        )
+        if any(batch is sensor_batch for sensor_batch in batches):
+            # Un solo sensor con datos: la fusión devuelve su batch cacheado,
+            # que no debe quedar marcado con la versión fusionada
+            batch = FireBatch(batch.floats, batch.acq_time, batch.codes, batch.categories)
+        batch.source_version = version
+        batch.index  # El índice espacial se construye una vez por refresco
+        self._fused[days] = batch
+        return batch
+    
+    def _url(self, sensor: str, bounds: str, days: int, api_key: str) -> str:
+        return f"{self.base_url}/area/csv/{api_key}/{sensor}/{bounds}/{days}"
+    
+    def _check_key(self, api_key: str, response: httpx.Response) -> None:
+        """Bloquea la key si FIRMS la rechazó (cuota agotada o key inválida)"""
+        if response.status_code == 429 or response.content.lstrip().startswith(FIRMS_KEY_ERRORS):
+            self.budget.block(api_key)
+            raise FIRMSUnavailableError(
+                f"FIRMS rechazó la key ...{api_key[-4:]}: {response.text[:80].strip()}"
+            )
+    
+    def _conditional_headers(self, key: Tuple) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since de la última respuesta (si FIRMS los envió)"""
+        with self._lock:
+            previous = self._payloads.get(key)
+        if previous is None:
+            return {}
+        headers = {}
+        if previous['etag']:
+            headers['If-None-Match'] = previous['etag']
+        if previous['last_modified']:
+            headers['If-Modified-Since'] = previous['last_modified']
+        return headers
+    
+    def _unchanged(self, key: Tuple, response: httpx.Response) -> Tuple[str, Optional[FireBatch]]:
+        """
+        Compara la respuesta con la anterior del mismo sensor
+        
+        Returns:
+            Tupla (sha256 del CSV, batch anterior si el contenido no cambió)
+        """
+        with self._lock:
+            previous = self._payloads.get(key)
+        if response.status_code == 304 and previous is not None:
+            return previous['sha256'], previous['batch']
+        
+        response.raise_for_status()
+        digest = hashlib.sha256(response.content).hexdigest()
+        if previous is not None and previous['sha256'] == digest:
+            self._remember(key, response, digest, previous['batch'])
+            return digest, previous['batch']
+        return digest, None
+    
+    def _remember(self, key: Tuple, response: httpx.Response, digest: str, batch: FireBatch) -> None:
+        with self._lock:
+            self._payloads[key] = {
+                'etag': response.headers.get('etag'),
+                'last_modified': response.headers.get('last-modified'),
+                'sha256': digest,
+                'batch': batch
+            }
+    
+    async def _download_fires(self, sensor: str, bounds: str, days: int, api_key: str) -> Tuple[str, FireBatch]:
+        """
+        Descarga el CSV de FIRMS sin bloquear el event loop (sin caché)
+        
+        Returns:
+            Tupla (sha256 del CSV, batch); el batch es el anterior si FIRMS
+            respondió 304 o el mismo contenido
+        """
+        key = (sensor, bounds, days)
+        response = await http_pool.request(
+            "GET", self._url(sensor, bounds, days, api_key),
+            headers=self._conditional_headers(key),
+            on_retry=lambda: self.budget.charge(api_key)
+        )
+        self._check_key(api_key, response)
+        digest, batch = self._unchanged(key, response)
+        if batch is None:
+            # Decodificar fuera del event loop
+            batch = await asyncio.to_thread(self._parse, response.text)
+            self._remember(key, response, digest, batch)
+        return digest, batch
+    
+    def _download_fires_sync(self, sensor: str, bounds: str, days: int, api_key: str) -> Tuple[str, FireBatch]:
+        """Versión síncrona de `_download_fires` (sin caché)"""
+        key = (sensor, bounds, days)
+        response = http_pool.request_sync(
+            "GET", self._url(sensor, bounds, days, api_key),
+            headers=self._conditional_headers(key),
+            on_retry=lambda: self.budget.charge(api_key)
+        )
+        self._check_key(api_key, response)
+        digest, batch = self._unchanged(key, response)
+        if batch is None:
+            batch = self._parse(response.text)
+            self._remember(key, response, digest, batch)
+        return digest, batch
+    
+    @staticmethod
+    def _parse(text: str) -> FireBatch:
+        return FireBatch.from_csv(text.splitlines())
+    
+    async def get_fires_near_location(
         self, 
         latitude: float, 
         longitude: float, 
@@ -80,48 +377,52 @@ class NASAFIRMSService:
     ) -> List[Dict]:
         """
         Obtiene incendios cerca de una ubicación específica
-        """
-        all_fires = self.get_fires_peru(days)
-        
-        nearby_fires = []
         
-        for fire in all_fires:
-            distance = self._calculate_distance(
-                latitude, 
-                longitude,
-                fire['latitude'],
-                fire['longitude']
-            )
-            
-            if distance <= radius_km:
-                fire['distance_km'] = round(distance, 2)
-                nearby_fires.append(fire)
+        Usa el índice espacial del batch: solo se evalúan las celdas
+        que cubren el radio de búsqueda.
+        """
+        batch = await self.get_fire_batch(days)
         
-        nearby_fires.sort(key=lambda x: x['distance_km'])
+        indices, distances = batch.index.query_radius(latitude, longitude, radius_km)
+        nearby_fires = batch.to_dicts(indices)
+        for fire, distance in zip(nearby_fires, distances.tolist()):
+            fire['distance_km'] = round(distance, 2)
         
         return nearby_fires
     
-    def _calculate_distance(
-        self, 
-        lat1: float, 
-        lon1: float, 
-        lat2: float, 
-        lon2: float
-    ) -> float:
-        """
-        Calcula distancia entre dos puntos usando fórmula Haversine
+    async def get_fire_events(self, days: int = 1, **params) -> List[Dict]:
         """
-        from math import radians, cos, sin, asin, sqrt
-        
-        lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+        Obtiene los eventos de incendio (detecciones agrupadas) en Perú
         
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
+        Args:
+            days: Días hacia atrás (1-10)
+            **params: eps_km / window_hours de la agrupación
+        """
+        batch = await self.get_fire_batch(days)
+        _, events = await asyncio.to_thread(get_fire_events, batch, **params)
+        return events
+    
+    async def get_events_near_location(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float = 20,
+        days: int = 1
+    ) -> List[Dict]:
+        """
+        Obtiene los eventos de incendio con alguna detección dentro del radio
         
-        r = 6371
+        Cada evento incluye `distance_km` a su detección más cercana y la
+        lista se ordena por esa distancia.
+        """
+        batch = await self.get_fire_batch(days)
+        labels, events = await asyncio.to_thread(get_fire_events, batch)
         
-        return c * r
+        indices, distances = batch.index.query_radius(latitude, longitude, radius_km)
+        indices, distances = nearest_per_event(labels, indices, distances)
+        return [
+            {**events[label], 'distance_km': round(distance, 2)}
+            for label, distance in zip(labels[indices].tolist(), distances.tolist())
+        ]
 
 nasa_firms_service = NASAFIRMSService()
\ No newline at end of file
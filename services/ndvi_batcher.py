@@ -0,0 +1,75 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+
+from config.settings import get_settings
+from services.earth_engine import EarthEngineService, earth_engine_service
+
+settings = get_settings()
+
+
+class NDVIPointBatcher:
+    """
+    Agrupa consultas de NDVI por punto en llamadas en lote a GEE
+
+    Los puntos que se resuelven localmente (raster o caché) responden sin
+    esperar la ventana; la lectura corre en un thread porque la caché toma
+    un lock que las escrituras mantienen mientras tanto. El resto espera
+    hasta `window_seconds` a que lleguen más consultas y todas se muestrean
+    juntas con un solo `get_forests_ndvi` (un `reduceRegions`), que corre
+    fuera del event loop. Cada llamador recibe el resultado de su punto.
+    """
+
+    def __init__(self, service: EarthEngineService, window_seconds: float = 0.05, max_batch: int = 500):
+        self.service = service
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending: Dict[Tuple[float, float], List["asyncio.Future"]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task"] = set()  # Referencias para que no se recolecten
+
+    async def get(self, lat: float, lon: float) -> Dict:
+        """NDVI y estado de salud de un punto (mismo formato que `get_forest_ndvi`)"""
+        point = (lat, lon)
+        local = await asyncio.to_thread(self.service.get_local_ndvi, {point: point})
+        if point in local:
+            return local[point]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(point, []).append(future)
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[Tuple[float, float], List["asyncio.Future"]]) -> None:
+        try:
+            results = await asyncio.to_thread(self.service.get_forests_ndvi, {point: point for point in batch})
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for point, futures in batch.items():
+            for future in futures:
+                if not future.done():  # El request pudo haberse cancelado
+                    future.set_result(results[point])
+
+
+# Instancia global
+ndvi_point_batcher = NDVIPointBatcher(earth_engine_service, window_seconds=settings.ndvi_batch_window_ms / 1000)
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from math import floor
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+from config.settings import get_settings
+
+settings = get_settings()
+
+# Tamaño de píxel de MOD13Q1 en grados (≈231 m); los puntos dentro del mismo
+# píxel comparten valor
+MODIS_PIXEL_DEG = 1 / 480
+
+# MOD13Q1 es una composición de 16 días; la siguiente se publica después de
+# que termina su propio período
+COMPOSITE_DAYS = 16
+
+# Si la composición esperada aún no se publicó, volver a consultar tras este tiempo
+RECHECK_AFTER = timedelta(hours=12)
+
+
+def snap_to_pixel(lat: float, lon: float) -> Tuple[int, int]:
+    """Fila y columna del píxel MODIS que contiene el punto"""
+    return floor(lat / MODIS_PIXEL_DEG), floor(lon / MODIS_PIXEL_DEG)
+
+
+def next_expiry(composite_date: str, now: Optional[datetime] = None) -> datetime:
+    """
+    Momento a partir del cual puede existir una composición más nueva
+
+    La composición que sigue a `composite_date` cubre los 16 días siguientes
+    y no aparece antes del fin de ese período. Si ese momento ya pasó (GEE se
+    atrasa), se vuelve a consultar cada RECHECK_AFTER.
+    """
+    now = now or datetime.now()
+    period_start = date.fromisoformat(composite_date)
+    next_release = datetime.combine(period_start + timedelta(days=2 * COMPOSITE_DAYS), datetime.min.time())
+    return max(next_release, now + RECHECK_AFTER)
+
+
+class NDVICache:
+    """
+    Caché persistente de NDVI por (píxel MODIS, fecha de composición)
+
+    Guarda el valor crudo de MOD13Q1 en SQLite, así sobrevive reinicios y
+    redeploys. Cada fila vence cuando puede haberse publicado la composición
+    siguiente; hasta entonces las lecturas del mismo píxel no consultan GEE.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ndvi (
+                pixel_row INTEGER NOT NULL,
+                pixel_col INTEGER NOT NULL,
+                composite_date TEXT NOT NULL,
+                ndvi_raw INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                expires_at TEXT NOT NULL,
+                PRIMARY KEY (pixel_row, pixel_col, composite_date)
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(
+        self,
+        points: Dict[Hashable, Tuple[float, float]],
+        include_expired: bool = False
+    ) -> Dict[Hashable, Dict]:
+        """
+        Valores vigentes para los puntos
+
+        Args:
+            points: {id: (lat, lon)}
+            include_expired: Aceptar filas vencidas (cuando GEE no responde,
+                la última composición conocida es mejor que una estimación)
+
+        Returns:
+            {id: {'ndvi_raw', 'composite_date', 'fetched_at'}} solo para los
+            puntos con una fila no vencida (o con alguna fila, si
+            `include_expired`)
+        """
+        query = "SELECT ndvi_raw, composite_date, fetched_at FROM ndvi WHERE pixel_row = ? AND pixel_col = ? "
+        params: Tuple = ()
+        if not include_expired:
+            query += "AND expires_at > ? "
+            params = (datetime.now().isoformat(),)
+        query += "ORDER BY composite_date DESC LIMIT 1"
+
+        results = {}
+        with self._lock:
+            for point_id, (lat, lon) in points.items():
+                row = self._conn.execute(query, (*snap_to_pixel(lat, lon), *params)).fetchone()
+                if row is not None:
+                    results[point_id] = {'ndvi_raw': row[0], 'composite_date': row[1], 'fetched_at': row[2]}
+        return results
+
+    def put_many(self, samples: Iterable[Tuple[float, float, int, str]]) -> None:
+        """
+        Guarda muestras recién obtenidas de GEE
+
+        Args:
+            samples: (lat, lon, ndvi_raw, composite_date) por punto
+        """
+        now = datetime.now()
+        rows = [
+            (*snap_to_pixel(lat, lon), composite_date, int(ndvi_raw), now.isoformat(),
+             next_expiry(composite_date, now).isoformat())
+            for lat, lon, ndvi_raw, composite_date in samples
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ndvi "
+                "(pixel_row, pixel_col, composite_date, ndvi_raw, fetched_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def purge(self, keep_days: int = 4 * COMPOSITE_DAYS) -> None:
+        """Elimina composiciones viejas"""
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        with self._lock:
+            self._conn.execute("DELETE FROM ndvi WHERE composite_date < ?", (cutoff,))
+            self._conn.commit()
+
+
+# Instancia global
+ndvi_cache = NDVICache(os.path.join(settings.data_dir, "ndvi_cache.sqlite"))
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+from datetime import date, datetime
+from typing import Iterable, Optional, Tuple
+
+from config.settings import get_settings
+from services.ndvi_cache import next_expiry, snap_to_pixel
+from services.ndvi_tile import NODATA
+
+settings = get_settings()
+
+
+class NDVISeries:
+    """Serie de NDVI crudo de un píxel: fechas (ordinal int32) y valores (int16)"""
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, since: int, checked_at: str):
+        self.dates = dates
+        self.values = values
+        self.since = since  # Primer día (ordinal) consultado a GEE
+        self.checked_at = checked_at
+
+    @property
+    def last_date(self) -> Optional[date]:
+        return date.fromordinal(int(self.dates[-1])) if len(self.dates) else None
+
+    def needs_update(self, now: Optional[datetime] = None) -> bool:
+        """Si ya puede existir una composición posterior a la última consultada"""
+        now = now or datetime.now()
+        last = self.last_date or date.fromordinal(self.since)
+        return now >= next_expiry(last.isoformat(), datetime.fromisoformat(self.checked_at))
+
+    def range(self, start: date, end: date) -> Tuple[np.ndarray, np.ndarray]:
+        """Fechas y valores con dato entre `start` y `end` (inclusive)"""
+        lo = np.searchsorted(self.dates, start.toordinal(), side="left")
+        hi = np.searchsorted(self.dates, end.toordinal(), side="right")
+        dates, values = self.dates[lo:hi], self.values[lo:hi]
+        valid = values != NODATA
+        return dates[valid], values[valid]
+
+
+class NDVIHistoryStore:
+    """
+    Series de NDVI por píxel MODIS, persistidas en SQLite
+
+    Cada píxel guarda sus fechas de composición (int32) y NDVI crudo (int16,
+    NODATA si la composición estaba enmascarada) como blobs compactos. Las
+    consultas de rango se resuelven localmente; GEE solo se consulta para
+    agregar las composiciones posteriores a la última guardada, o las
+    anteriores a `since` si se pide un rango más largo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ndvi_series (
+                pixel_row INTEGER NOT NULL,
+                pixel_col INTEGER NOT NULL,
+                dates BLOB NOT NULL,
+                ndvi_raw BLOB NOT NULL,
+                since INTEGER NOT NULL,
+                checked_at TEXT NOT NULL,
+                PRIMARY KEY (pixel_row, pixel_col)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, lat: float, lon: float) -> Optional[NDVISeries]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dates, ndvi_raw, since, checked_at FROM ndvi_series "
+                "WHERE pixel_row = ? AND pixel_col = ?",
+                snap_to_pixel(lat, lon)
+            ).fetchone()
+        if row is None:
+            return None
+        return NDVISeries(
+            dates=np.frombuffer(row[0], dtype=np.int32),
+            values=np.frombuffer(row[1], dtype=np.int16),
+            since=row[2],
+            checked_at=row[3]
+        )
+
+    def merge(
+        self,
+        lat: float,
+        lon: float,
+        samples: Iterable[Tuple[str, Optional[int]]],
+        since: date,
+        checked: bool = True
+    ) -> NDVISeries:
+        """
+        Incorpora composiciones recién consultadas a la serie del píxel
+
+        Args:
+            samples: (fecha ISO, NDVI crudo o None si estaba enmascarado)
+            since: Inicio del rango consultado a GEE
+            checked: Si la consulta incluyó las composiciones más recientes;
+                en un relleno hacia atrás se conserva el `checked_at` anterior
+
+        Returns:
+            Serie actualizada
+        """
+        samples = list(samples)
+        new_dates = np.array([date.fromisoformat(d).toordinal() for d, _ in samples], dtype=np.int32)
+        new_values = np.array([NODATA if v is None else v for _, v in samples], dtype=np.int16)
+
+        checked_at = datetime.now().isoformat()
+        with self._lock:
+            existing = self.get(lat, lon)
+            if existing is not None:
+                if not checked:
+                    checked_at = existing.checked_at
+                new_dates = np.concatenate([existing.dates, new_dates])
+                new_values = np.concatenate([existing.values, new_values])
+                since = min(since, date.fromordinal(existing.since))
+
+            # Ordenar por fecha y quedarse con la última lectura de cada composición
+            order = np.argsort(new_dates, kind="stable")
+            new_dates, new_values = new_dates[order], new_values[order]
+            keep = np.append(new_dates[1:] != new_dates[:-1], True)[:len(new_dates)]
+            series = NDVISeries(new_dates[keep], new_values[keep], since.toordinal(), checked_at)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ndvi_series "
+                "(pixel_row, pixel_col, dates, ndvi_raw, since, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (*snap_to_pixel(lat, lon), series.dates.tobytes(), series.values.tobytes(),
+                 series.since, series.checked_at)
+            )
+            self._conn.commit()
+        return series
+
+
+# Instancia global
+ndvi_history_store = NDVIHistoryStore(os.path.join(settings.data_dir, "ndvi_history.sqlite"))
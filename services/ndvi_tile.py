@@ -0,0 +1,207 @@
+import os
+import threading
+import numpy as np
+from datetime import date, datetime, timedelta
+from math import floor
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from config.settings import get_settings
+from services.ndvi_cache import COMPOSITE_DAYS, MODIS_PIXEL_DEG
+from utils.storage import read_json, write_json_atomic
+
+settings = get_settings()
+
+# Límites de Perú (oeste, sur, este, norte), múltiplos del píxel de MODIS
+PERU_BBOX = (-81.3, -18.3, -68.7, 0.0)
+
+# Valor de los píxeles sin dato (enmascarados en la composición)
+NODATA = -32768
+
+# Bloques de descarga desde GEE (2 MB de int16 por request)
+CHUNK_PIXELS = 1024
+
+# Si el refresco se atrasa más de dos composiciones, el raster deja de usarse
+MAX_AGE = timedelta(days=2 * COMPOSITE_DAYS)
+
+
+class NDVITile:
+    """
+    Raster local de NDVI (composición MOD13Q1) para Perú
+
+    El NDVI crudo de MODIS se guarda como int16 en un archivo binario plano
+    (fila 0 = borde norte) que se abre memory-mapped: leer un punto o una
+    ventana chica es indexar el arreglo, sin red. La grilla es la misma que
+    usa la caché de NDVI (MODIS_PIXEL_DEG), así que ambas coinciden píxel a
+    píxel.
+
+    El refresco escribe un archivo nuevo y lo reemplaza de forma atómica;
+    los lectores detectan el cambio por el metadata.json. Un raster con una
+    composición de más de MAX_AGE se trata como ausente.
+    """
+
+    def __init__(self, directory: str, bbox: Tuple[float, float, float, float] = PERU_BBOX):
+        self.directory = directory
+        self.bbox = bbox
+        west, south, east, north = bbox
+        self._west_pixel = round(west / MODIS_PIXEL_DEG)
+        self._north_pixel = round(north / MODIS_PIXEL_DEG)
+        self.width = round(east / MODIS_PIXEL_DEG) - self._west_pixel
+        self.height = self._north_pixel - round(south / MODIS_PIXEL_DEG)
+
+        self._lock = threading.Lock()
+        self._array: Optional[np.memmap] = None
+        self.metadata: Optional[Dict] = None
+        self._mtime = 0.0
+        self._reload_if_changed()
+
+    @property
+    def _raster_path(self) -> str:
+        return os.path.join(self.directory, "ndvi.int16")
+
+    @property
+    def _metadata_path(self) -> str:
+        return os.path.join(self.directory, "metadata.json")
+
+    @property
+    def composite_date(self) -> Optional[str]:
+        self._reload_if_changed()
+        return self.metadata['composite_date'] if self.metadata else None
+
+    def _reload_if_changed(self) -> None:
+        if not os.path.exists(self._metadata_path):
+            return
+        mtime = os.path.getmtime(self._metadata_path)
+        if mtime <= self._mtime:
+            return
+        with self._lock:
+            metadata = read_json(self._metadata_path)
+            if metadata is None or tuple(metadata['bbox']) != tuple(self.bbox):
+                return
+            self._mtime = mtime
+            try:
+                array = np.memmap(self._raster_path, dtype=np.int16, mode="r", shape=(self.height, self.width))
+            except (OSError, ValueError) as e:
+                # Raster faltante o truncado: ignorarlo hasta el próximo refresco
+                print(f"⚠️ Raster de NDVI inválido en {self.directory}: {e}")
+                self._array, self.metadata = None, None
+                return
+            self._array = array
+            self.metadata = metadata
+
+    def _current(self) -> Tuple[Optional[np.memmap], Optional[Dict]]:
+        """Raster y metadata vigentes (None si no hay raster o está vencido)"""
+        self._reload_if_changed()
+        array, metadata = self._array, self.metadata
+        if array is None or metadata is None:
+            return None, None
+        if date.today() - date.fromisoformat(metadata['composite_date']) > MAX_AGE:
+            return None, None
+        return array, metadata
+
+    def _pixel(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Fila y columna del raster (pueden quedar fuera de rango)"""
+        rows = self._north_pixel - 1 - np.floor(lats / MODIS_PIXEL_DEG).astype(np.int64)
+        cols = np.floor(lons / MODIS_PIXEL_DEG).astype(np.int64) - self._west_pixel
+        return rows, cols
+
+    def lookup_many(self, points: Dict[Hashable, Tuple[float, float]]) -> Dict[Hashable, Tuple[int, str]]:
+        """
+        NDVI de los puntos que caen dentro del raster
+
+        Args:
+            points: {id: (lat, lon)}
+
+        Returns:
+            {id: (NDVI crudo, fecha de la composición)}; se omiten los puntos
+            fuera del raster o sin dato
+        """
+        array, metadata = self._current()
+        if array is None or not points:
+            return {}
+
+        ids = list(points)
+        coords = np.array([points[point_id] for point_id in ids], dtype=np.float64).reshape(-1, 2)
+        rows, cols = self._pixel(coords[:, 0], coords[:, 1])
+        inside = np.flatnonzero((rows >= 0) & (rows < self.height) & (cols >= 0) & (cols < self.width))
+        values = array[rows[inside], cols[inside]]
+
+        return {
+            ids[i]: (int(value), metadata['composite_date'])
+            for i, value in zip(inside.tolist(), values.tolist())
+            if value != NODATA
+        }
+
+    def lookup(self, lat: float, lon: float) -> Optional[Tuple[int, str]]:
+        """NDVI crudo y fecha de composición en un punto (None fuera del raster)"""
+        return self.lookup_many({0: (lat, lon)}).get(0)
+
+    def window(self, lat: float, lon: float, radius_pixels: int = 2) -> Optional[np.ndarray]:
+        """
+        Ventana cuadrada de NDVI crudo centrada en el punto
+
+        Returns:
+            Arreglo float con NaN en los píxeles sin dato (recortado en los
+            bordes del raster), o None si el punto cae fuera
+        """
+        array, _ = self._current()
+        if array is None:
+            return None
+        rows, cols = self._pixel(np.array([lat]), np.array([lon]))
+        row, col = int(rows[0]), int(cols[0])
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            return None
+
+        values = array[
+            max(0, row - radius_pixels):row + radius_pixels + 1,
+            max(0, col - radius_pixels):col + radius_pixels + 1
+        ].astype(np.float64)
+        values[values == NODATA] = np.nan
+        return values
+
+    def refresh(
+        self,
+        composite_date: str,
+        fetch_chunk: Callable[[float, float, int, int], np.ndarray]
+    ) -> None:
+        """
+        Descarga el raster completo por bloques y reemplaza el actual
+
+        Args:
+            composite_date: Fecha de la composición a descargar
+            fetch_chunk: (oeste, norte, ancho, alto) → arreglo int16 (alto, ancho)
+                con NODATA en los píxeles sin dato
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._raster_path}.tmp"
+        raster = np.memmap(tmp_path, dtype=np.int16, mode="w+", shape=(self.height, self.width))
+
+        west, _, _, north = self.bbox
+        for row in range(0, self.height, CHUNK_PIXELS):
+            for col in range(0, self.width, CHUNK_PIXELS):
+                height = min(CHUNK_PIXELS, self.height - row)
+                width = min(CHUNK_PIXELS, self.width - col)
+                raster[row:row + height, col:col + width] = fetch_chunk(
+                    west + col * MODIS_PIXEL_DEG,
+                    north - row * MODIS_PIXEL_DEG,
+                    width,
+                    height
+                )
+        raster.flush()
+        del raster
+
+        # Los lectores con el raster anterior abierto lo siguen viendo hasta recargar
+        os.replace(tmp_path, self._raster_path)
+        write_json_atomic(self._metadata_path, {
+            "bbox": list(self.bbox),
+            "pixel_deg": MODIS_PIXEL_DEG,
+            "width": self.width,
+            "height": self.height,
+            "nodata": NODATA,
+            "composite_date": composite_date,
+            "built_at": datetime.now().isoformat()
+        })
+        self._reload_if_changed()
+
+
+# Instancia global
+ndvi_tile = NDVITile(os.path.join(settings.data_dir, "ndvi_tile"))
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+from config.settings import get_settings
+from services.http_client import RETRY_STATUS_CODES
+from services.notifier import NotificationService, notification_service
+
+settings = get_settings()
+
+
+class TokenBucket:
+    """Limitador token bucket thread-safe (`rate` tokens por segundo)"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloquea hasta que haya un token disponible y lo consume"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def _is_rejection(error: Exception) -> bool:
+    """Resend respondió y rechazó el request (4xx distinto de 429)"""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return False
+    status = error.response.status_code
+    return 400 <= status < 500 and status not in RETRY_STATUS_CODES
+
+
+def _idempotency_key(dispatch_id: str, payload) -> str:
+    """Clave estable solo dentro de un `dispatch` (Resend la recuerda 24 h)"""
+    content = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(f"{dispatch_id}:{content}".encode()).hexdigest()
+
+
+class NotificationDispatcher:
+    """
+    Envío concurrente y con límite de tasa de emails de Resend
+
+    Los mensajes se agrupan en lotes para la API batch de Resend y se
+    reparten entre un pool acotado de workers. Cada request (lote o email
+    individual) consume un token del bucket, ajustado a la cuota de Resend.
+    Los errores transitorios se reintentan con backoff usando una
+    Idempotency-Key, y un lote rechazado (4xx) se reenvía mensaje por mensaje
+    para aislar al destinatario inválido. Un lote que falla por timeout o 5xx
+    no se reenvía por separado: Resend pudo haberlo aceptado y se duplicarían
+    los emails.
+    """
+
+    def __init__(
+        self,
+        notifier: NotificationService,
+        rate_per_second: float = 2.0,
+        batch_size: int = 100,
+        workers: int = 4,
+        max_retries: int = 3,
+        backoff_seconds: float = 1.0
+    ):
+        self.notifier = notifier
+        self.batch_size = max(1, min(batch_size, 100))  # Máximo de la API batch
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._bucket = TokenBucket(rate_per_second, capacity=rate_per_second)
+
+    def dispatch(self, messages: Sequence[Dict]) -> List[bool]:
+        """
+        Envía mensajes de Resend (ver `NotificationService.build_*`)
+
+        Args:
+            messages: Payloads de email
+
+        Returns:
+            Por mensaje, True si se entregó a Resend
+        """
+        if not messages:
+            return []
+
+        chunks = [
+            list(range(start, min(start + self.batch_size, len(messages))))
+            for start in range(0, len(messages), self.batch_size)
+        ]
+        delivered = [False] * len(messages)
+        # Los reintentos de este envío comparten clave; un digest idéntico
+        # enviado en otra ejecución no debe ser descartado por Resend
+        dispatch_id = uuid.uuid4().hex
+
+        def run(chunk: List[int]) -> None:
+            for i, ok in zip(chunk, self._send_chunk(dispatch_id, [messages[i] for i in chunk])):
+                delivered[i] = ok
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as executor:
+            list(executor.map(run, chunks))
+
+        return delivered
+
+    def _send_chunk(self, dispatch_id: str, chunk: List[Dict]) -> List[bool]:
+        if len(chunk) > 1:
+            try:
+                self._with_retries(dispatch_id, self.notifier._send_batch, chunk)
+                return [True] * len(chunk)
+            except Exception as e:
+                if not _is_rejection(e):
+                    print(f"❌ Error enviando lote de {len(chunk)} emails: {e}")
+                    return [False] * len(chunk)
+                print(f"⚠️ Lote de {len(chunk)} emails rechazado ({e}); enviando uno por uno")
+
+        results = []
+        for message in chunk:
+            try:
+                self._with_retries(dispatch_id, self.notifier._send_email, message)
+                results.append(True)
+            except Exception as e:
+                print(f"❌ Error enviando email a {', '.join(message.get('to', []))}: {e}")
+                results.append(False)
+        return results
+
+    def _with_retries(self, dispatch_id: str, send, payload):
+        key = _idempotency_key(dispatch_id, payload)
+        for attempt in range(self.max_retries + 1):
+            self._bucket.acquire()
+            try:
+                # Sin reintentos del pool: cada intento debe pasar por el bucket
+                return send(payload, idempotency_key=key, max_retries=0)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+            time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+
+
+# Instancia global
+notification_dispatcher = NotificationDispatcher(
+    notification_service,
+    rate_per_second=settings.resend_rate_limit_per_second,
+    batch_size=settings.resend_batch_size,
+    workers=settings.notification_workers
+)
@@ -1,65 +1,92 @@
-import resend
 from config.settings import get_settings
-from typing import Optional
+from services.http_client import http_pool
+from typing import Dict, List, Optional
 
 settings = get_settings()
-resend.api_key = settings.resend_api_key
+
+RESEND_API_URL = "https://api.resend.com/emails"
+RESEND_BATCH_URL = f"{RESEND_API_URL}/batch"
+SENDER = "WYSYCS <alertas@wysycs.health>"
 
 class NotificationService:
     """Servicio para enviar notificaciones por email"""
     
     @staticmethod
-    def send_adoption_email(guardian_name: str, guardian_email: str, forest_name: str) -> bool:
-        """Email de confirmación de adopción"""
-        try:
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: #f9fafb; padding: 30px; border-radius: 0 0 10px 10px; }}
-                    .forest-name {{ color: #10b981; font-size: 24px; font-weight: bold; }}
-                    .cta-button {{ background: #10b981; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin-top: 20px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🌳 Congratulations {guardian_name}!</h1>
-                    </div>
-                    <div class="content">
-                        <p>You have successfully adopted:</p>
-                        <p class="forest-name">{forest_name}</p>
+    def _post(url: str, payload, idempotency_key: Optional[str] = None, max_retries: Optional[int] = None):
+        headers = {"Authorization": f"Bearer {settings.resend_api_key}"}
+        if idempotency_key:
+            # Resend descarta reenvíos con la misma clave (reintentos seguros)
+            headers["Idempotency-Key"] = idempotency_key
+        response = http_pool.request_sync("POST", url, json=payload, headers=headers, max_retries=max_retries)
+        response.raise_for_status()
+        return response.json()
+    
+    @staticmethod
+    def _send_email(params: Dict, idempotency_key: Optional[str] = None, max_retries: Optional[int] = None) -> Dict:
+        """Envía un email vía la API REST de Resend usando el pool HTTP compartido"""
+        return NotificationService._post(RESEND_API_URL, params, idempotency_key, max_retries)
+    
+    @staticmethod
+    def _send_batch(messages: List[Dict], idempotency_key: Optional[str] = None, max_retries: Optional[int] = None) -> Dict:
+        """Envía hasta 100 emails en un solo request (API batch de Resend)"""
+        return NotificationService._post(RESEND_BATCH_URL, messages, idempotency_key, max_retries)
+    
+    @staticmethod
+    def build_adoption_email(guardian_name: str, guardian_email: str, forest_name: str) -> Dict:
+        """Mensaje de confirmación de adopción (payload de Resend)"""
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+                .content {{ background: #f9fafb; padding: 30px; border-radius: 0 0 10px 10px; }}
+                .forest-name {{ color: #10b981; font-size: 24px; font-weight: bold; }}
+                .cta-button {{ background: #10b981; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; display: inline-block; margin-top: 20px; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>🌳 Congratulations {guardian_name}!</h1>
+                </div>
+                <div class="content">
+                    <p>You have successfully adopted:</p>
+                    <p class="forest-name">{forest_name}</p>
 
-                        <p>As a Guardian of this forest, you will now receive:</p>
-                        <ul>
-                            <li>🔥 Real-time alerts for nearby fires</li>
-                            <li>📊 Forest health reports (NDVI)</li>
-                            <li>🏆 Points for each day protecting the forest</li>
-                        </ul>
+                    <p>As a Guardian of this forest, you will now receive:</p>
+                    <ul>
+                        <li>🔥 Real-time alerts for nearby fires</li>
+                        <li>📊 Forest health reports (NDVI)</li>
+                        <li>🏆 Points for each day protecting the forest</li>
+                    </ul>
 
-                        <p><strong>Your mission:</strong> Protect and monitor this Amazonian forest.</p>
+                    <p><strong>Your mission:</strong> Protect and monitor this Amazonian forest.</p>
 
-                        <p style="margin-top: 30px; color: #6b7280;">
-                            What You See, You Can Save 💚
-                        </p>
-                    </div>
+                    <p style="margin-top: 30px; color: #6b7280;">
+                        What You See, You Can Save 💚
+                    </p>
                 </div>
-            </body>
-            </html>
-            """
-            
-            params = {
-                "from": "WYSYCS <alertas@wysycs.health>",
-                "to": [guardian_email],
-                "subject": f"🌳 You adopted {forest_name}!",
-                "html": html_content
-            }
-            
-            response = resend.Emails.send(params)
+            </div>
+        </body>
+        </html>
+        """
+        
+        return {
+            "from": SENDER,
+            "to": [guardian_email],
+            "subject": f"🌳 You adopted {forest_name}!",
+            "html": html_content
+        }
+    
+    @staticmethod
+    def send_adoption_email(guardian_name: str, guardian_email: str, forest_name: str) -> bool:
+        """Email de confirmación de adopción"""
+        try:
+            params = NotificationService.build_adoption_email(guardian_name, guardian_email, forest_name)
+            response = NotificationService._send_email(params)
             print(f"✅ Email enviado a {guardian_email}: {response}")
             return True
             
@@ -68,60 +95,64 @@ class NotificationService:
             return False
     
     @staticmethod
-    def send_fire_alert(guardian_email: str, forest_name: str, distance_km: float) -> bool:
-        """Email de alerta de incendio"""
-        try:
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                    .content {{ background: #fef2f2; padding: 30px; border-radius: 0 0 10px 10px; }}
-                    .alert-box {{ background: white; border-left: 4px solid #ef4444; padding: 15px; margin: 20px 0; }}
-                    .distance {{ font-size: 36px; font-weight: bold; color: #ef4444; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🔥 FIRE ALERT!</h1>
-                    </div>
-                    <div class="content">
-                        <p><strong>Your forest {forest_name} is in danger.</strong></p>
+    def build_fire_alert(guardian_email: str, forest_name: str, distance_km: float) -> Dict:
+        """Mensaje de alerta de incendio (payload de Resend)"""
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+                .content {{ background: #fef2f2; padding: 30px; border-radius: 0 0 10px 10px; }}
+                .alert-box {{ background: white; border-left: 4px solid #ef4444; padding: 15px; margin: 20px 0; }}
+                .distance {{ font-size: 36px; font-weight: bold; color: #ef4444; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>🔥 FIRE ALERT!</h1>
+                </div>
+                <div class="content">
+                    <p><strong>Your forest {forest_name} is in danger.</strong></p>
 
-                        <div class="alert-box">
-                            <p>Fire detected at:</p>
-                            <p class="distance">{distance_km:.1f} km</p>
-                            <p style="color: #6b7280;">NASA Data - Satellite Detection</p>
-                        </div>
+                    <div class="alert-box">
+                        <p>Fire detected at:</p>
+                        <p class="distance">{distance_km:.1f} km</p>
+                        <p style="color: #6b7280;">NASA Data - Satellite Detection</p>
+                    </div>
 
-                        <p><strong>Recommended actions:</strong></p>
-                        <ul>
-                            <li>🚨 Alert local authorities</li>
-                            <li>👥 Check with the community</li>
-                            <li>📞 Contact firefighters if necessary</li>
-                        </ul>
+                    <p><strong>Recommended actions:</strong></p>
+                    <ul>
+                        <li>🚨 Alert local authorities</li>
+                        <li>👥 Check with the community</li>
+                        <li>📞 Contact firefighters if necessary</li>
+                    </ul>
 
-                        <p style="margin-top: 30px; color: #dc2626;">
-                            <strong>Act fast. Every minute counts.</strong>
-                        </p>
-                    </div>
+                    <p style="margin-top: 30px; color: #dc2626;">
+                        <strong>Act fast. Every minute counts.</strong>
+                    </p>
                 </div>
-            </body>
-            </html>
-            """
-            
-            params = {
-                "from": "WYSYCS <alertas@wysycs.health>",
-                "to": [guardian_email],
-                "subject": f"🔥 ALERT: Fire near {forest_name}",
-                "html": html_content
-            }
-            
-            response = resend.Emails.send(params)
+            </div>
+        </body>
+        </html>
+        """
+        
+        return {
+            "from": SENDER,
+            "to": [guardian_email],
+            "subject": f"🔥 ALERT: Fire near {forest_name}",
+            "html": html_content
+        }
+    
+    @staticmethod
+    def send_fire_alert(guardian_email: str, forest_name: str, distance_km: float) -> bool:
+        """Email de alerta de incendio"""
+        try:
+            params = NotificationService.build_fire_alert(guardian_email, forest_name, distance_km)
+            response = NotificationService._send_email(params)
             print(f"✅ Alerta enviada a {guardian_email}: {response}")
             return True
             
@@ -129,5 +160,86 @@ class NotificationService:
             print(f"❌ Error enviando alerta: {e}")
             return False
 
+    @staticmethod
+    def build_fire_digest(guardian_email: str, guardian_name: str, forests: List[Dict]) -> Dict:
+        """
+        Resumen de alertas de incendio de un guardián (payload de Resend)
+        
+        Args:
+            guardian_email: Email del guardián
+            guardian_name: Nombre del guardián
+            forests: Bosques amenazados (forest_name, distance_km, events,
+                detections, severity), del más cercano al más lejano
+        """
+        rows = "".join(
+            f"""
+                    <tr>
+                        <td>{f['forest_name']}</td>
+                        <td class="distance">{f['distance_km']:.1f} km</td>
+                        <td>{f['events']}</td>
+                        <td>{f['detections']}</td>
+                        <td>{f['severity']}</td>
+                    </tr>"""
+            for f in forests
+        )
+        if len(forests) == 1:
+            intro = f"{guardian_name}, your forest {forests[0]['forest_name']} is in danger."
+        else:
+            intro = f"{guardian_name}, {len(forests)} of your forests are in danger."
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+                .content {{ background: #fef2f2; padding: 30px; border-radius: 0 0 10px 10px; }}
+                table {{ width: 100%; background: white; border-collapse: collapse; margin: 20px 0; }}
+                th, td {{ padding: 8px; border-bottom: 1px solid #fecaca; text-align: left; }}
+                .distance {{ font-weight: bold; color: #ef4444; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>🔥 FIRE ALERT!</h1>
+                </div>
+                <div class="content">
+                    <p><strong>{intro}</strong></p>
+
+                    <table>
+                        <tr><th>Forest</th><th>Nearest fire</th><th>Fires</th><th>Detections</th><th>Severity</th></tr>{rows}
+                    </table>
+                    <p style="color: #6b7280;">NASA Data - Satellite Detection</p>
+
+                    <p><strong>Recommended actions:</strong></p>
+                    <ul>
+                        <li>🚨 Alert local authorities</li>
+                        <li>👥 Check with the community</li>
+                        <li>📞 Contact firefighters if necessary</li>
+                    </ul>
+
+                    <p style="margin-top: 30px; color: #dc2626;">
+                        <strong>Act fast. Every minute counts.</strong>
+                    </p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+        
+        if len(forests) == 1:
+            subject = f"🔥 ALERT: Fire near {forests[0]['forest_name']}"
+        else:
+            subject = f"🔥 ALERT: Fires near {len(forests)} of your forests"
+        
+        return {
+            "from": SENDER,
+            "to": [guardian_email],
+            "subject": subject,
+            "html": html_content
+        }
+
 # Instancia global
 notification_service = NotificationService()
\ No newline at end of file
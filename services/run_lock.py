@@ -0,0 +1,156 @@
+import fcntl
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from postgrest.exceptions import APIError
+
+from config.settings import get_settings
+
+settings = get_settings()
+
+UNIQUE_VIOLATION = "23505"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class SupabaseLeaseLock:
+    """
+    Leases con vencimiento guardados en Supabase (compartidos entre procesos)
+
+    Requiere la tabla `cron_locks` (migrations/001_cron_locks.sql); se
+    activa con CRON_LOCK_BACKEND=supabase.
+
+    Tomar un lease es un INSERT (falla si ya existe) o, si el existente
+    venció, un UPDATE condicionado a `expires_at < now`; ambos son atómicos
+    en Postgres, así que solo un proceso lo obtiene.
+    """
+
+    def __init__(self, client, table: str = "cron_locks"):
+        self.client = client
+        self.table = table
+
+    def acquire(self, name: str, owner: str, ttl_seconds: int) -> bool:
+        now = _now()
+        expires_at = (now + timedelta(seconds=ttl_seconds)).isoformat()
+        try:
+            self.client.table(self.table) \
+                .insert({'name': name, 'owner': owner, 'expires_at': expires_at}) \
+                .execute()
+            return True
+        except APIError as e:
+            if e.code != UNIQUE_VIOLATION:
+                raise
+
+        # Ya existe: tomarlo solo si venció
+        result = self.client.table(self.table) \
+            .update({'owner': owner, 'expires_at': expires_at}) \
+            .eq('name', name) \
+            .lt('expires_at', now.isoformat()) \
+            .execute()
+        return bool(result.data)
+
+    def renew(self, name: str, owner: str, ttl_seconds: int) -> bool:
+        """Extiende un lease propio; False si ya no pertenece a `owner`"""
+        expires_at = (_now() + timedelta(seconds=ttl_seconds)).isoformat()
+        result = self.client.table(self.table) \
+            .update({'expires_at': expires_at}) \
+            .eq('name', name) \
+            .eq('owner', owner) \
+            .execute()
+        return bool(result.data)
+
+    def release(self, name: str, owner: str) -> None:
+        self.client.table(self.table) \
+            .delete() \
+            .eq('name', name) \
+            .eq('owner', owner) \
+            .execute()
+
+    def purge_expired(self) -> None:
+        self.client.table(self.table) \
+            .delete() \
+            .lt('expires_at', _now().isoformat()) \
+            .execute()
+
+
+class FileLeaseLock:
+    """
+    Equivalente local de `SupabaseLeaseLock` (un archivo JSON por lease)
+
+    El check-and-set se hace bajo `flock`, así que es seguro entre procesos
+    de una misma máquina (varios workers de uvicorn, cron + API locales).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", name) + ".json")
+
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(os.path.join(self.directory, ".lock"), "w")
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _read(self, path: str):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def acquire(self, name: str, owner: str, ttl_seconds: int) -> bool:
+        path = self._path(name)
+        with self._locked():
+            lease = self._read(path)
+            if lease and lease['owner'] != owner and datetime.fromisoformat(lease['expires_at']) > _now():
+                return False
+
+            expires_at = (_now() + timedelta(seconds=ttl_seconds)).isoformat()
+            with open(path, "w") as f:
+                json.dump({'name': name, 'owner': owner, 'expires_at': expires_at}, f)
+            return True
+
+    def renew(self, name: str, owner: str, ttl_seconds: int) -> bool:
+        path = self._path(name)
+        with self._locked():
+            lease = self._read(path)
+            if not lease or lease['owner'] != owner:
+                return False
+            lease['expires_at'] = (_now() + timedelta(seconds=ttl_seconds)).isoformat()
+            with open(path, "w") as f:
+                json.dump(lease, f)
+            return True
+
+    def release(self, name: str, owner: str) -> None:
+        path = self._path(name)
+        with self._locked():
+            lease = self._read(path)
+            if lease and lease['owner'] == owner:
+                os.remove(path)
+
+    def purge_expired(self) -> None:
+        with self._locked():
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if not name.endswith(".json"):
+                    continue
+                lease = self._read(path)
+                if lease is None or datetime.fromisoformat(lease['expires_at']) <= _now():
+                    os.remove(path)
+
+
+def _create_lock():
+    if settings.cron_lock_backend == "supabase":
+        from services.database import supabase
+        return SupabaseLeaseLock(supabase)
+    return FileLeaseLock(os.path.join(settings.data_dir, "locks"))
+
+
+# Instancia global
+cron_lock = _create_lock()
@@ -0,0 +1,131 @@
+"""
+Benchmark del pipeline de alertas de incendio
+
+Corre `check_fires_and_alert` en modo replay (tasks/replay.py) sobre una
+grilla de escenarios sintéticos y reporta por escenario:
+- tiempo total y por etapa
+- round trips a la base
+- pico de memoria (tracemalloc, en una segunda corrida para no distorsionar
+  el tiempo)
+
+El geofence se construye antes de medir, como en el cron en régimen (la
+etapa `adoptions` solo compara ids); `--cold` incluye la reconstrucción
+en la medición.
+
+Uso:
+    python tasks/benchmark_alerts.py
+    python tasks/benchmark_alerts.py --adoptions 1000 10000 --detections 1000
+    python tasks/benchmark_alerts.py --firms viirs.csv --adoptions-file adoptions.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+# Agregar el directorio raíz al path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.job_runner import Job
+from tasks.replay import ReplayEnvironment, synthetic_adoptions, write_synthetic_firms_csv
+
+DEFAULT_ADOPTIONS = (1_000, 10_000, 100_000)
+DEFAULT_DETECTIONS = (1_000, 50_000)
+
+
+def _measure(
+    firms_paths: Sequence[str],
+    adoptions: List[Dict],
+    cold: bool,
+    trace_memory: bool
+) -> Dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        env = ReplayEnvironment(workdir, firms_paths, adoptions)
+        if not cold:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                env.geofence.rebuild(adoptions)
+
+        job = Job("benchmark")
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            counts = env.run(job)
+        elapsed = time.perf_counter() - started
+        job.end_stage()
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+        return {
+            "seconds": elapsed,
+            "stages": dict(job.stages),
+            "round_trips": sum(env.db.round_trips.values()),
+            "peak_mb": peak / 1e6 if peak is not None else None,
+            "counts": counts,
+            "messages": len(env.dispatcher.messages)
+        }
+
+
+def run_scenario(
+    firms_paths: Sequence[str],
+    adoptions: List[Dict],
+    cold: bool = False,
+    memory: bool = True
+) -> Dict:
+    """Mide un escenario (tiempo sin tracemalloc; memoria en corrida aparte)"""
+    result = _measure(firms_paths, adoptions, cold, trace_memory=False)
+    if memory:
+        result["peak_mb"] = _measure(firms_paths, adoptions, cold, trace_memory=True)["peak_mb"]
+    return result
+
+
+def _report(label: str, result: Dict) -> None:
+    stages = " ".join(f"{name}={seconds:.2f}s" for name, seconds in result["stages"].items())
+    peak = f"{result['peak_mb']:.1f} MB" if result["peak_mb"] is not None else "-"
+    print(f"{label:<28} {result['seconds']:>8.2f}s {result['round_trips']:>6} {peak:>10} "
+          f"{result['counts'].get('alerts_sent', 0):>8}  {stages}")
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de alertas de incendio")
+    parser.add_argument("--adoptions", type=int, nargs="+", default=DEFAULT_ADOPTIONS,
+                        help="Cantidades de adopciones sintéticas")
+    parser.add_argument("--detections", type=int, nargs="+", default=DEFAULT_DETECTIONS,
+                        help="Cantidades de detecciones sintéticas")
+    parser.add_argument("--firms", nargs="+", help="CSV grabados de FIRMS (reemplazan a las detecciones sintéticas)")
+    parser.add_argument("--adoptions-file", help="JSON grabado de adopted_forests (reemplaza a las sintéticas)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cold", action="store_true", help="Incluir la reconstrucción del geofence")
+    parser.add_argument("--no-memory", action="store_true", help="No medir memoria (una sola corrida)")
+    args = parser.parse_args(argv)
+
+    if args.adoptions_file:
+        with open(args.adoptions_file) as f:
+            adoption_sets = [(f"{os.path.basename(args.adoptions_file)}", json.load(f))]
+    else:
+        adoption_sets = [(f"{n} adopciones", synthetic_adoptions(n, args.seed)) for n in args.adoptions]
+
+    print(f"{'Escenario':<28} {'Tiempo':>9} {'DB RT':>6} {'Memoria':>10} {'Alertas':>8}  Etapas")
+    with tempfile.TemporaryDirectory() as fixtures:
+        if args.firms:
+            firms_sets = [("replay", args.firms)]
+        else:
+            firms_sets = []
+            for n in args.detections:
+                path = os.path.join(fixtures, f"firms_{n}.csv")
+                write_synthetic_firms_csv(path, n, args.seed)
+                firms_sets.append((f"{n} det", [path]))
+
+        for adoptions_label, adoptions in adoption_sets:
+            for firms_label, firms_paths in firms_sets:
+                result = run_scenario(firms_paths, adoptions, cold=args.cold, memory=not args.no_memory)
+                _report(f"{adoptions_label} × {firms_label}", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,135 +1,315 @@
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 # Agregar el directorio raíz al path para imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.database import supabase
-from services.nasa_firms import nasa_firms_service
+from services.fire_events import get_fire_events, nearest_per_event
+from services.fire_ingest import FireIngester, fire_ingester
+from services.fire_store import FireDetectionStore, fire_detection_store
+from services.geofence import GeofenceIndex, geofence_index
+from services.job_runner import Job
+from services.notification_dispatcher import NotificationDispatcher, notification_dispatcher
 from services.notifier import notification_service
-from math import radians, cos, sin, asin, sqrt
+from services.run_lock import cron_lock
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calcular distancia entre dos puntos en km (Haversine)"""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * asin(sqrt(a))
-    return 6371 * c  # Radio de la Tierra en km
+ALERTS_CONSUMER = "fire_alerts"
+SENT_PAGE_SIZE = 1000  # Límite de filas por consulta de PostgREST
 
-def check_fires_and_alert():
-    """Verificar incendios y enviar alertas"""
+# Una ejecución por slot del schedule de GitHub Actions ("0 */2 * * *")
+CHECK_INTERVAL_HOURS = 2
+RUN_LOCK = "check-fires"
+RUN_LEASE_SECONDS = 30 * 60
+ADOPTION_PAGE_SIZE = 1000
+ADOPTION_ID_CHUNK = 100  # Ids por consulta al cargar adopciones nuevas
+
+def _load_active_adoptions(db) -> List[Dict]:
+    """Adopciones activas con el bosque embebido (reconstrucción del geofence)"""
+    return db.table('adopted_forests') \
+        .select('*, forests(*)') \
+        .eq('is_active', True) \
+        .execute() \
+        .data
+
+def _load_active_adoption_ids(db) -> List[str]:
+    """Ids de las adopciones activas (chequeo liviano de altas y bajas)"""
+    ids = []
+    offset = 0
+    while True:
+        result = db.table('adopted_forests') \
+            .select('id') \
+            .eq('is_active', True) \
+            .range(offset, offset + ADOPTION_PAGE_SIZE - 1) \
+            .execute()
+        ids.extend(str(row['id']) for row in result.data)
+        if len(result.data) < ADOPTION_PAGE_SIZE:
+            return ids
+        offset += ADOPTION_PAGE_SIZE
+
+def _load_adoptions_by_id(db, adoption_ids: List[str]) -> List[Dict]:
+    """Adopciones activas con el bosque embebido, solo las de `adoption_ids`"""
+    adoptions = []
+    for start in range(0, len(adoption_ids), ADOPTION_ID_CHUNK):
+        adoptions.extend(
+            db.table('adopted_forests')
+            .select('*, forests(*)')
+            .in_('id', adoption_ids[start:start + ADOPTION_ID_CHUNK])
+            .eq('is_active', True)
+            .execute()
+            .data
+        )
+    return adoptions
+
+def _load_sent_today(db) -> Set[Tuple[str, str]]:
+    """
+    Pares (forest_id, guardian_email) que ya recibieron alerta hoy
+
+    Se cargan una vez por ejecución (paginando de a SENT_PAGE_SIZE filas)
+    para decidir cada alerta en memoria. Las filas de resumen por guardián
+    cubren todos los bosques de su `alert_data.forest_ids`.
+    """
+    today = datetime.now().date()
+    sent = set()
+    offset = 0
+    while True:
+        result = db.table('alerts_sent') \
+            .select('forest_id, guardian_email, alert_data') \
+            .gte('sent_at', today.isoformat()) \
+            .range(offset, offset + SENT_PAGE_SIZE - 1) \
+            .execute()
+        
+        for row in result.data:
+            forest_ids = (row.get('alert_data') or {}).get('forest_ids') or [row['forest_id']]
+            sent.update((str(forest_id), row['guardian_email']) for forest_id in forest_ids)
+        if len(result.data) < SENT_PAGE_SIZE:
+            return sent
+        offset += SENT_PAGE_SIZE
+
+def check_fires_and_alert(
+    job: Optional[Job] = None,
+    db=supabase,
+    ingester: FireIngester = fire_ingester,
+    store: FireDetectionStore = fire_detection_store,
+    geofence: GeofenceIndex = geofence_index,
+    dispatcher: NotificationDispatcher = notification_dispatcher
+) -> Dict[str, int]:
+    """
+    Verificar incendios y enviar alertas
+    
+    Args:
+        job: Trabajo donde reportar etapas y contadores (JobRunner); si se
+            omite (CLI) se usa uno local
+        db, ingester, store, geofence, dispatcher: Dependencias; por defecto
+            las instancias globales (tasks/replay.py las reemplaza por
+            fixtures locales)
+    
+    Returns:
+        Contadores de la ejecución
+    """
+    job = job or Job("check-fires")
     print(f"\n{'='*60}")
     print(f"🔍 WYSYCS - Verificación de Incendios")
     print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*60}\n")
     
     try:
-        # 1. Obtener incendios activos de NASA FIRMS
+        # 1. Ingerir incendios de NASA FIRMS y tomar solo los nuevos
+        job.stage("ingest")
         print("📡 Consultando NASA FIRMS API...")
-        fires = nasa_firms_service.get_fires_peru(days=2)
-        print(f"✅ {len(fires)} incendios detectados en Perú\n")
+        ingester.ingest(days=2)
+        fires, cursor = store.changes_since(ALERTS_CONSUMER)
+        job.count("new_fires", len(fires))
+        print(f"✅ {len(fires)} incendios nuevos desde la última verificación\n")
         
-        if not fires:
-            print("ℹ️  No hay incendios activos. Finalizando.\n")
-            return
+        if not len(fires):
+            print("ℹ️  No hay incendios nuevos. Finalizando.\n")
+            return job.counts
         
-        # 2. Obtener bosques adoptados activos
-        print("🌳 Consultando bosques adoptados...")
-        result = supabase.table('adopted_forests') \
-            .select('*, forests(*)') \
-            .eq('is_active', True) \
-            .execute()
+        # 2. Bosques adoptados activos (índice de geofence; de la base solo
+        #    se leen los ids para detectar altas y bajas)
+        job.stage("adoptions")
+        print("🌳 Cargando suscripciones de bosques adoptados...")
+        geofence.ensure_fresh(lambda: _load_active_adoptions(db))
+        added, removed = geofence.sync(
+            _load_active_adoption_ids(db),
+            lambda adoption_ids: _load_adoptions_by_id(db, adoption_ids)
+        )
+        if added or removed:
+            print(f"🗺️  Geofence sincronizado: +{added} / -{removed} adopciones")
+        job.count("adoptions", len(geofence))
+        print(f"✅ {len(geofence)} bosques bajo vigilancia\n")
         
-        adopted_forests = result.data
-        print(f"✅ {len(adopted_forests)} bosques bajo vigilancia\n")
-        
-        if not adopted_forests:
+        if not len(geofence):
             print("ℹ️  No hay bosques adoptados. Finalizando.\n")
-            return
+            store.commit(ALERTS_CONSUMER, cursor)
+            return job.counts
+        
+        # Agrupar detecciones en eventos: se alerta por incendio, no por píxel
+        job.stage("events")
+        labels, events = get_fire_events(fires)
+        job.count("events", len(events))
+        print(f"🔥 {len(events)} eventos de incendio\n")
         
-        # 3. Verificar distancias y enviar alertas
+        # 3. Verificar distancias (búsqueda por celda) y enviar alertas
+        job.stage("match")
         print("🔍 Analizando proximidad de incendios...\n")
-        alerts_sent = 0
+        sent_today = _load_sent_today(db)
+        matched = set()
+        digests: Dict[str, Dict] = {}
         
-        for adoption in adopted_forests:
-            forest = adoption.get('forests')
-            if not forest:
-                continue
-            
-            forest_lat = forest['latitude']
-            forest_lon = forest['longitude']
-            forest_name = forest['name']
+        for adoption, nearby, distances in geofence.match(fires):
+            forest_name = adoption['forest_name']
             guardian_email = adoption['guardian_email']
             guardian_name = adoption['guardian_name']
             
-            # Verificar incendios cercanos (< 20km)
-            for fire in fires:
-                distance = calculate_distance(
-                    forest_lat, forest_lon,
-                    fire['latitude'], fire['longitude']
-                )
-                
-                if distance < 20:  # Alerta si está a menos de 20km
-                    print(f"⚠️  ALERTA DETECTADA:")
-                    print(f"   Bosque: {forest_name}")
-                    print(f"   Guardián: {guardian_name} ({guardian_email})")
-                    print(f"   Distancia: {distance:.1f} km")
-                    print(f"   Confianza: {fire.get('confidence', 'N/A')}")
-                    
-                    # Verificar si ya enviamos alerta para este bosque hoy
-                    today = datetime.now().date()
-                    existing_alert = supabase.table('alerts_sent') \
-                        .select('*') \
-                        .eq('forest_id', adoption['forest_id']) \
-                        .eq('guardian_email', guardian_email) \
-                        .gte('sent_at', today.isoformat()) \
-                        .execute()
-                    
-                    if existing_alert.data:
-                        print(f"   ℹ️  Alerta ya enviada hoy. Omitiendo.\n")
-                        continue
-                    
-                    # Enviar email de alerta
-                    try:
-                        notification_service.send_fire_alert(
-                            guardian_email=guardian_email,
-                            forest_name=forest_name,
-                            distance_km=distance
-                        )
-                        
-                        # Registrar alerta enviada
-                        supabase.table('alerts_sent').insert({
-                            'forest_id': adoption['forest_id'],
-                            'guardian_email': guardian_email,
-                            'alert_type': 'fire',
-                            'severity': 'CRITICAL' if distance < 10 else 'HIGH',
-                            'alert_data': {
-                                'distance_km': distance,
-                                'fire_confidence': fire.get('confidence'),
-                                'fire_brightness': fire.get('brightness')
-                            }
-                        }).execute()
-                        
-                        alerts_sent += 1
-                        print(f"   ✅ Alerta enviada exitosamente\n")
-                        
-                    except Exception as email_error:
-                        print(f"   ❌ Error enviando email: {email_error}\n")
+            # Verificar si ya enviamos alerta para este bosque hoy
+            alert_key = (str(adoption['forest_id']), guardian_email)
+            if alert_key in sent_today:
+                print(f"ℹ️  {forest_name} ({guardian_email}): alerta ya enviada hoy. Omitiendo.")
+                continue
+            if alert_key in matched:
+                continue  # Adopción repetida del mismo bosque y guardián
+            matched.add(alert_key)
+            
+            # Un evento por incendio: su detección más cercana al bosque
+            nearby, distances = nearest_per_event(labels, nearby, distances)
+            nearest_event = events[labels[nearby[0]]]
+            distance = float(distances[0])
+            print(f"⚠️  ALERTA: {forest_name} - {guardian_name} ({guardian_email}) - "
+                  f"{len(nearby)} eventos, el más cercano a {distance:.1f} km")
+            
+            # Todos los bosques del guardián van en un solo email por ejecución
+            digest = digests.setdefault(guardian_email, {'guardian_name': guardian_name, 'forests': []})
+            digest['forests'].append({
+                'forest_id': adoption['forest_id'],
+                'forest_name': forest_name,
+                'distance_km': round(distance, 2),
+                'severity': 'CRITICAL' if distance < 10 else 'HIGH',
+                'events': len(nearby),
+                'detections': int(sum(events[label]['detections'] for label in labels[nearby].tolist())),
+                'nearest_event_id': nearest_event['id'],
+                'nearest_event_frp': nearest_event['total_frp']
+            })
+        
+        pending_messages: List[Dict] = []
+        pending_alerts: List[Dict] = []
+        for guardian_email, digest in digests.items():
+            forests = sorted(digest['forests'], key=lambda f: f['distance_km'])
+            nearest = forests[0]
+            pending_messages.append(notification_service.build_fire_digest(
+                guardian_email=guardian_email,
+                guardian_name=digest['guardian_name'],
+                forests=forests
+            ))
+            # Una fila resumen por guardián; forest_ids cubre la de-duplicación diaria
+            pending_alerts.append({
+                'forest_id': nearest['forest_id'],
+                'guardian_email': guardian_email,
+                'alert_type': 'fire_digest',
+                'severity': nearest['severity'],
+                'alert_data': {
+                    'forest_ids': [f['forest_id'] for f in forests],
+                    'nearest_distance_km': nearest['distance_km'],
+                    'forests': forests
+                }
+            })
+        print()
+        
+        # Enviar todas las alertas en paralelo (respetando la cuota de Resend)
+        job.stage("dispatch")
+        job.count("forests_alerted", sum(len(d['forests']) for d in digests.values()))
+        job.count("alerts_pending", len(pending_messages))
+        print(f"📧 Enviando {len(pending_messages)} alertas (una por guardián)...")
+        delivered = dispatcher.dispatch(pending_messages)
+        new_alerts = [row for row, ok in zip(pending_alerts, delivered) if ok]
+        if len(new_alerts) < len(pending_alerts):
+            print(f"   ❌ {len(pending_alerts) - len(new_alerts)} emails no se pudieron enviar")
+        
+        job.stage("log")
+        if new_alerts:
+            db.table('alerts_sent').insert(new_alerts).execute()
+        alerts_sent = len(new_alerts)
+        job.count("alerts_sent", alerts_sent)
+        
+        if alerts_sent < len(pending_alerts):
+            # Sin avanzar el cursor: la próxima ejecución vuelve a evaluar estas
+            # detecciones; las alertas ya entregadas se omiten por alerts_sent
+            job.count("alerts_failed", len(pending_alerts) - alerts_sent)
+            print("   ⏸️  Cursor sin avanzar: se reintentarán las alertas no entregadas")
+        else:
+            store.commit(ALERTS_CONSUMER, cursor)
         
         # 4. Resumen final
         print(f"{'='*60}")
         print(f"📊 RESUMEN:")
-        print(f"   Incendios detectados: {len(fires)}")
-        print(f"   Bosques monitoreados: {len(adopted_forests)}")
+        print(f"   Incendios nuevos: {len(fires)}")
+        print(f"   Eventos de incendio: {len(events)}")
+        print(f"   Bosques monitoreados: {len(geofence)}")
+        print(f"   Bosques en alerta: {job.counts['forests_alerted']}")
         print(f"   Alertas enviadas: {alerts_sent}")
         print(f"{'='*60}\n")
+        return job.counts
         
     except Exception as e:
         print(f"❌ ERROR CRÍTICO: {e}\n")
         raise
 
+def slot_key(now: Optional[datetime] = None) -> str:
+    """Clave de idempotencia del slot programado que contiene `now` (UTC)"""
+    now = now or datetime.now(timezone.utc)
+    start = now.replace(hour=now.hour - now.hour % CHECK_INTERVAL_HOURS, minute=0, second=0, microsecond=0)
+    return f"{RUN_LOCK}:{start.strftime('%Y-%m-%dT%H:%M')}Z"
+
+def run_check_fires(job: Optional[Job] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Ejecuta `check_fires_and_alert` con lock de ejecución e idempotencia
+    
+    - Un lease por slot programado: otros disparos del mismo slot (reintentos,
+      workflow_dispatch, otros workers) no vuelven a ejecutar.
+    - Un lease de ejecución: nunca corren dos verificaciones a la vez. Se
+      renueva al inicio de cada etapa; si se perdió (la ejecución superó
+      RUN_LEASE_SECONDS sin renovar y otro proceso lo tomó) la ejecución se
+      aborta antes de enviar nada más.
+    
+    Si la ejecución falla se libera el slot para que un reintento pueda correr.
+    
+    Args:
+        job: Trabajo donde reportar el progreso
+        force: Ejecutar aunque el slot ya se haya procesado
+    """
+    job = job or Job("check-fires")
+    slot = slot_key()
+    
+    if not force and not cron_lock.acquire(slot, job.id, CHECK_INTERVAL_HOURS * 3600):
+        print(f"ℹ️  {slot} ya fue procesado. Omitiendo.\n")
+        return {"skipped": "slot_already_processed", "slot": slot}
+    
+    if not cron_lock.acquire(RUN_LOCK, job.id, RUN_LEASE_SECONDS):
+        print("ℹ️  Otra verificación está en curso. Omitiendo.\n")
+        if not force:
+            cron_lock.release(slot, job.id)
+        return {"skipped": "run_in_progress", "slot": slot}
+    
+    def renew_lease(stage: str) -> None:
+        if not cron_lock.renew(RUN_LOCK, job.id, RUN_LEASE_SECONDS):
+            raise RuntimeError(f"Lease de ejecución perdido antes de la etapa '{stage}'")
+    
+    job.on_stage = renew_lease
+    try:
+        counts = check_fires_and_alert(job)
+    except Exception:
+        if not force:
+            cron_lock.release(slot, job.id)
+        raise
+    finally:
+        job.on_stage = None
+        cron_lock.release(RUN_LOCK, job.id)
+        cron_lock.purge_expired()
+    
+    return {**counts, "slot": slot}
+
 if __name__ == "__main__":
-    check_fires_and_alert()
\ No newline at end of file
+    run_check_fires(force="--force" in sys.argv)
\ No newline at end of file
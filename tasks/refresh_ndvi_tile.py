@@ -0,0 +1,30 @@
+import os
+import sys
+from typing import Dict, Optional
+
+# Agregar el directorio raíz al path para imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.earth_engine import earth_engine_service
+from services.job_runner import Job
+
+RUN_KEY = "refresh-ndvi-tile"
+
+def refresh_ndvi_tile(job: Optional[Job] = None, force: bool = False) -> Dict:
+    """
+    Actualizar el raster local de NDVI de Perú con la última composición MOD13Q1
+    
+    Args:
+        job: Trabajo donde reportar el progreso (JobRunner)
+        force: Descargar aunque el raster ya tenga la composición más reciente
+    """
+    job = job or Job(RUN_KEY)
+    job.stage("download")
+    updated = earth_engine_service.refresh_ndvi_tile(force=force)
+    return {
+        "updated": updated,
+        "composite_date": earth_engine_service.tile.composite_date
+    }
+
+if __name__ == "__main__":
+    refresh_ndvi_tile(force="--force" in sys.argv)
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.cache import TTLCache
+
+
+def test_concurrent_misses_load_once():
+    cache = TTLCache(ttl_seconds=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "fresh"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", loader))) for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["fresh"] * 8
+
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached():
+    cache = TTLCache(ttl_seconds=60)
+
+    def failing():
+        raise RuntimeError("FIRMS caído")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", failing)
+    assert cache.peek("k") is None
+    assert cache.get_or_load("k", lambda: 1) == 1
+
+
+def test_stale_value_is_served_while_refreshing():
+    cache = TTLCache(ttl_seconds=0.05, stale_seconds=60)
+    cache.get_or_load("k", lambda: "old")
+    time.sleep(0.1)
+
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.set()
+        return "new"
+
+    assert cache.get_or_load("k", loader) == "old"
+    assert refreshed.wait(5)
+    for _ in range(100):
+        if cache.peek("k") == "new":
+            break
+        time.sleep(0.01)
+    assert cache.peek("k") == "new"
+
+
+def test_expired_past_stale_window_blocks_on_reload():
+    cache = TTLCache(ttl_seconds=0.05, stale_seconds=0)
+    cache.get_or_load("k", lambda: "old")
+    time.sleep(0.1)
+    assert cache.get_or_load("k", lambda: "new") == "new"
+
+
+def test_lru_eviction():
+    cache = TTLCache(ttl_seconds=60, max_entries=2)
+    for key in ("a", "b"):
+        cache.get_or_load(key, lambda key=key: key)
+    cache.get_or_load("a", lambda: "unused")  # "a" pasa a ser la más reciente
+    cache.get_or_load("c", lambda: "c")
+    assert cache.peek("b") is None
+    assert cache.peek("a") == "a"
+
+
+def test_async_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl_seconds=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "fresh"
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_load("k", loader) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["fresh"] * 5
+    assert len(calls) == 1
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from models.fires import RECORD_FIELDS, FireBatch
+
+VIIRS_HEADER = "latitude,longitude,bright_ti4,scan,track,acq_date,acq_time,satellite,instrument,confidence,version,bright_ti5,frp,daynight"
+
+
+def test_viirs_aliases_and_column_order():
+    # Columnas en otro orden que el habitual; se ubican por encabezado
+    lines = [
+        "acq_time,longitude,latitude,acq_date,bright_ti4,confidence",
+        "0312,-75.5,-8.25,2026-10-16,331.5,h",
+    ]
+    batch = FireBatch.from_csv(lines)
+    assert len(batch) == 1
+    record = batch.record(0)
+    assert (record['latitude'], record['longitude']) == (-8.25, -75.5)
+    assert record['brightness'] == 331.5
+    assert record['acq_time'] == "0312"
+    assert record['confidence'] == "h"
+    assert np.isnan(record['frp'])
+    assert list(record) == list(RECORD_FIELDS)
+
+
+def test_invalid_rows_are_dropped():
+    lines = [
+        VIIRS_HEADER,
+        "-8.0,-75.0,330.0,0.4,0.4,2026-10-16,0300,N,VIIRS,n,2.0NRT,290.0,5.0,D",
+        "no-es-numero,-75.0,330.0,0.4,0.4,2026-10-16,0300,N,VIIRS,n,2.0NRT,290.0,5.0,D",
+        "-8.0,-75.0,330.0",
+        "",
+        "-9.0,-74.0,340.0,0.4,0.4,2026-10-17,1405,N,VIIRS,l,2.0NRT,295.0,7.5,N",
+    ]
+    batch = FireBatch.from_csv(lines)
+    assert batch.latitude.tolist() == [-8.0, -9.0]
+    assert batch.decode('acq_date').tolist() == ["2026-10-16", "2026-10-17"]
+    assert batch.acq_time.tolist() == [300, 1405]
+
+
+def test_missing_required_columns():
+    with pytest.raises(ValueError):
+        FireBatch.from_csv(["latitude,longitude,acq_date", "-8.0,-75.0,2026-10-16"])
+    assert len(FireBatch.from_csv([])) == 0
+
+
+def test_concat_remaps_categories_and_roundtrips(tmp_path):
+    first = FireBatch.from_csv([VIIRS_HEADER, "-8.0,-75.0,330.0,0.4,0.4,2026-10-16,0300,N,VIIRS,n,2.0NRT,290.0,5.0,D"])
+    second = FireBatch.from_csv([VIIRS_HEADER, "-9.0,-74.0,340.0,0.4,0.4,2026-10-17,1405,1,VIIRS,h,2.0NRT,295.0,7.5,N"])
+    merged = FireBatch.concat([first, second])
+    assert merged.to_dicts() == first.to_dicts() + second.to_dicts()
+
+    merged.save(str(tmp_path / "batch"))
+    assert FireBatch.load(str(tmp_path / "batch"), mmap=True).to_dicts() == merged.to_dicts()
+    assert len(FireBatch.load(str(tmp_path / "missing"))) == 0
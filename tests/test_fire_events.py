@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import services.fire_events as fire_events
+from models.fires import RECORD_FIELDS, FireBatch
+from services.fire_events import EVENTS_MEMO_SIZE, cluster_detections, get_fire_events
+
+
+def _batch(*detections):
+    """Detecciones (lat, lon, 'HHMM') del mismo día"""
+    lines = [",".join(RECORD_FIELDS)]
+    for lat, lon, acq_time in detections:
+        lines.append(f"{lat},{lon},330.0,0.4,0.4,2026-10-16,{acq_time},N,VIIRS,n,2.0NRT,290.0,5.0,D")
+    return FireBatch.from_csv(lines)
+
+
+def test_chains_form_one_event_and_far_points_another():
+    # A-B y B-C a ~1.1 km (A-C a ~2.2 km): un solo evento por clausura
+    batch = _batch((-8.0, -75.0, "0300"), (-8.01, -75.0, "0300"), (-8.02, -75.0, "0300"), (-9.0, -75.0, "0300"))
+    labels = cluster_detections(batch, eps_km=1.5, window_hours=24)
+    assert labels[0] == labels[1] == labels[2] != labels[3]
+
+
+def test_time_window_splits_events():
+    batch = _batch((-8.0, -75.0, "0100"), (-8.0, -75.0, "2300"))
+    assert len(set(cluster_detections(batch, eps_km=1.5, window_hours=6).tolist())) == 2
+    assert len(set(cluster_detections(batch, eps_km=1.5, window_hours=24).tolist())) == 1
+
+
+def test_dense_cells_are_compared_in_blocks(monkeypatch):
+    rng = np.random.default_rng(0)
+    points = [(-8.0 + d, -75.0 + e, "0300") for d, e in rng.normal(0, 0.02, (300, 2)).round(5)]
+    batch = _batch(*points)
+    expected = cluster_detections(batch, eps_km=10, window_hours=24)
+
+    monkeypatch.setattr(fire_events, "PAIR_BLOCK", 50)
+    assert np.array_equal(cluster_detections(batch, eps_km=10, window_hours=24), expected)
+
+
+def test_memo_is_bounded_and_thread_safe():
+    batch = _batch((-8.0, -75.0, "0300"), (-8.01, -75.0, "0300"))
+    params = [(1 + i / 10, 24) for i in range(12)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda p: get_fire_events(batch, *p), params * 5))
+
+    assert all(len(labels) == 2 for labels, _ in results)
+    assert len(fire_events._events_memo[batch]) <= EVENTS_MEMO_SIZE
+    # Parámetros que solo difieren bajo la centésima comparten entrada
+    assert get_fire_events(batch, 1.5, 24) is get_fire_events(batch, 1.500001, 24)
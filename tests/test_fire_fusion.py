@@ -0,0 +1,62 @@
+from models.fires import RECORD_FIELDS, FireBatch
+from services.fire_fusion import fuse_sensor_batches
+
+
+def _batch(*detections):
+    """Detecciones (lat, lon, 'YYYY-MM-DD', 'HHMM', instrumento)"""
+    lines = [",".join(RECORD_FIELDS)]
+    for lat, lon, acq_date, acq_time, instrument in detections:
+        lines.append(
+            f"{lat},{lon},330.0,0.4,0.4,{acq_date},{acq_time},N,{instrument},n,2.0NRT,290.0,5.0,D"
+        )
+    return FireBatch.from_csv(lines)
+
+
+def _fused(viirs, modis):
+    return fuse_sensor_batches([viirs, modis], cell_deg=0.01, window_minutes=120)
+
+
+def test_same_cell_keeps_higher_priority_sensor():
+    fused = _fused(
+        _batch((-8.305, -75.605, "2026-10-16", "0350", "VIIRS")),
+        _batch((-8.305, -75.605, "2026-10-16", "0345", "MODIS"))
+    )
+    assert fused.decode('instrument').tolist() == ["VIIRS"]
+
+
+def test_duplicates_across_cell_border_are_merged():
+    # -8.301 y -8.300 caen en celdas distintas de 0.01°
+    fused = _fused(
+        _batch((-8.301, -75.601, "2026-10-16", "0350", "VIIRS")),
+        _batch((-8.300, -75.600, "2026-10-16", "0345", "MODIS"))
+    )
+    assert fused.decode('instrument').tolist() == ["VIIRS"]
+
+
+def test_duplicates_across_time_bucket_are_merged():
+    # 01:59 y 02:01 caen en bloques de 120 minutos distintos
+    fused = _fused(
+        _batch((-8.305, -75.605, "2026-10-16", "0201", "VIIRS")),
+        _batch((-8.305, -75.605, "2026-10-16", "0159", "MODIS"))
+    )
+    assert fused.decode('instrument').tolist() == ["VIIRS"]
+
+
+def test_distant_detections_are_kept():
+    fused = _fused(
+        _batch((-8.305, -75.605, "2026-10-16", "0350", "VIIRS")),
+        _batch(
+            (-8.355, -75.605, "2026-10-16", "0345", "MODIS"),  # 5 celdas al sur
+            (-8.305, -75.605, "2026-10-16", "1045", "MODIS")   # 3 bloques después
+        )
+    )
+    assert sorted(fused.decode('instrument').tolist()) == ["MODIS", "MODIS", "VIIRS"]
+
+
+def test_same_sensor_detections_are_never_dropped():
+    viirs = _batch(
+        (-8.305, -75.605, "2026-10-16", "0350", "VIIRS"),
+        (-8.306, -75.605, "2026-10-16", "0351", "VIIRS")
+    )
+    assert len(_fused(viirs, FireBatch.empty())) == 2
+    assert len(fuse_sensor_batches([viirs, viirs.take([0])])) == 2
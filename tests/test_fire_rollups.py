@@ -0,0 +1,62 @@
+from datetime import date
+
+from models.fires import RECORD_FIELDS, FireBatch
+from services.fire_archive import FireArchive
+from services.fire_rollups import FireRollups
+
+
+def _batch(*detections):
+    """Detecciones (lat, lon, fecha, confianza)"""
+    lines = [",".join(RECORD_FIELDS)]
+    for lat, lon, acq_date, confidence in detections:
+        lines.append(f"{lat},{lon},330.0,0.4,0.4,{acq_date},0300,N,VIIRS,{confidence},2.0NRT,290.0,5.0,D")
+    return FireBatch.from_csv(lines)
+
+
+def test_incremental_updates_sum_per_day(tmp_path):
+    rollups = FireRollups(str(tmp_path / "rollups.json"))
+    rollups.update(_batch((-8.5, -75.5, "2026-10-15", "h"), (-8.5, -75.5, "2026-10-16", "n")))
+    rollups.update(_batch((-9.5, -74.5, "2026-10-16", "85")))
+
+    summary = rollups.summary(date(2026, 10, 15), date(2026, 10, 16), include_regions=True)
+    assert summary["total_fires"] == 3
+    assert summary["fires_by_date"] == {"2026-10-15": 1, "2026-10-16": 2}
+    assert summary["high_confidence_fires"] == 2  # 'h' y MODIS 85 %
+    assert summary["fires_by_region"] == {"-9,-76": 2, "-10,-75": 1}
+
+    # Otro proceso ve los agregados persistidos
+    assert FireRollups(str(tmp_path / "rollups.json")).summary(date(2026, 10, 16), date(2026, 10, 16))["total_fires"] == 2
+
+
+def test_coverage_distinguishes_no_fires_from_no_data(tmp_path):
+    rollups = FireRollups(str(tmp_path / "rollups.json"))
+    rollups.update(_batch((-8.0, -75.0, "2026-10-10", "n")))
+    rollups.mark_covered(date(2026, 10, 14), date(2026, 10, 16))
+
+    missing = rollups.uncovered_days(date(2026, 10, 10), date(2026, 10, 16))
+    assert missing == [date(2026, 10, 11), date(2026, 10, 12), date(2026, 10, 13)]
+
+
+def test_filled_from_takes_only_requested_days(tmp_path):
+    rollups = FireRollups(str(tmp_path / "rollups.json"))
+    rollups.update(_batch((-8.0, -75.0, "2026-10-16", "n")))
+    other = FireRollups.from_batch(_batch(
+        (-8.0, -75.0, "2026-10-14", "n"), (-8.0, -75.0, "2026-10-15", "n"), (-8.0, -75.0, "2026-10-16", "n")
+    ))
+
+    merged = rollups.filled_from(other, [date(2026, 10, 14)])
+    assert merged.summary(date(2026, 10, 14), date(2026, 10, 16))["fires_by_date"] == {"2026-10-14": 1, "2026-10-16": 1}
+    # El original no cambia
+    assert rollups.summary(date(2026, 10, 14), date(2026, 10, 16))["total_fires"] == 1
+
+
+def test_archive_partitions_by_date(tmp_path):
+    archive = FireArchive(str(tmp_path / "archive"))
+    assert archive.dates() == []
+    archive.append(_batch((-8.0, -75.0, "2026-10-15", "n"), (-8.1, -75.0, "2026-10-16", "n")))
+    archive.append(_batch((-8.2, -75.0, "2026-10-16", "h")))
+
+    assert archive.dates() == ["2026-10-15", "2026-10-16"]
+    assert sorted(archive.query(date(2026, 10, 16), date(2026, 10, 16)).latitude.tolist()) == [-8.2, -8.1]
+    assert len(archive.query(date(2026, 10, 10), date(2026, 10, 17))) == 3
+    assert len(archive.query(date(2026, 10, 1), date(2026, 10, 2))) == 0
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+import routes.fires as fires_route
+from models.fires import RECORD_FIELDS, FireBatch
+from services.fire_archive import FireArchive
+from services.fire_rollups import FireRollups
+from services.nasa_firms import FIRMSUnavailableError
+
+
+def _batch(days_ago):
+    lines = [",".join(RECORD_FIELDS)]
+    for i, ago in enumerate(days_ago):
+        day = (date.today() - timedelta(days=ago)).isoformat()
+        lines.append(f"-8.{i:03d},-75.5,330.0,0.4,0.4,{day},0350,N,VIIRS,h,2.0NRT,290.0,5.0,D")
+    return FireBatch.from_csv(lines)
+
+
+class FakeFIRMS:
+    source = "fake"
+
+    def __init__(self, batch=None):
+        self.batch = batch
+        self.requested = []
+
+    async def get_fire_batch(self, days):
+        self.requested.append(days)
+        if self.batch is None:
+            raise FIRMSUnavailableError("sin FIRMS")
+        return self.batch
+
+
+@pytest.fixture
+def stats_env(tmp_path, monkeypatch):
+    rollups = FireRollups(str(tmp_path / "rollups.json"))
+    archive = FireArchive(str(tmp_path / "archive"))
+    monkeypatch.setattr(fires_route, "fire_rollups", rollups)
+    monkeypatch.setattr(fires_route, "fire_archive", archive)
+    return rollups, archive
+
+
+def _stats(firms, days, monkeypatch):
+    monkeypatch.setattr(fires_route, "nasa_firms_service", firms)
+    return asyncio.run(fires_route.get_fire_statistics(days=days, by_region=False))
+
+
+def test_fresh_data_dir_fills_recent_days_from_firms(stats_env, monkeypatch):
+    firms = FakeFIRMS(_batch([0, 1, 5]))
+    stats = _stats(firms, 30, monkeypatch)
+
+    assert firms.requested == [10]
+    assert stats["total_fires"] == 3
+    assert stats["data_source"] == "rollups+firms"
+    assert stats["uncovered_days"] == 20
+
+
+def test_missing_data_is_not_reported_as_no_fires(stats_env, monkeypatch):
+    stats = _stats(FakeFIRMS(None), 30, monkeypatch)
+
+    assert stats["total_fires"] == 0
+    assert stats["uncovered_days"] == 30
+    assert stats["data_source"] == "rollups"
+    assert "No se detectaron" not in stats["message"]
+
+
+def test_only_uncovered_days_come_from_firms(stats_env, monkeypatch):
+    rollups, _ = stats_env
+    today = date.today()
+    rollups.update(_batch([0, 0]))
+    rollups.mark_covered(today - timedelta(days=1), today)
+
+    # FIRMS repite los días cubiertos; solo deben contarse los que faltan
+    firms = FakeFIRMS(_batch([0, 0, 3]))
+    stats = _stats(firms, 7, monkeypatch)
+
+    assert firms.requested == [7]
+    assert stats["total_fires"] == 3
+    assert stats["uncovered_days"] == 0
+
+
+def test_older_uncovered_days_come_from_archive(stats_env, monkeypatch):
+    _, archive = stats_env
+    archive.append(_batch([20, 25, 25]))
+
+    stats = _stats(FakeFIRMS(_batch([])), 30, monkeypatch)
+
+    assert stats["total_fires"] == 3
+    assert stats["data_source"] == "rollups+firms+archive"
+    assert stats["uncovered_days"] == 18
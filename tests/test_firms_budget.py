@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from services.nasa_firms import PRIORITY_CRON, FIRMSBudget, FIRMSUnavailableError
+
+
+def test_acquire_is_all_or_nothing_and_spreads_keys():
+    budget = FIRMSBudget(["key-a", "key-b"], limit=10, reserve=0)
+    keys = budget.acquire(4)
+    assert sorted(keys) == ["key-a", "key-a", "key-b", "key-b"]
+
+    with pytest.raises(FIRMSUnavailableError):
+        budget.acquire(17)
+    assert [k["used"] for k in budget.status()["keys"]] == [2, 2]
+
+
+def test_interactive_traffic_leaves_the_cron_reserve():
+    budget = FIRMSBudget(["key-a"], limit=10, reserve=0.2)
+    budget.acquire(8)
+    with pytest.raises(FIRMSUnavailableError):
+        budget.acquire(1)
+    assert budget.acquire(2, priority=PRIORITY_CRON) == ["key-a", "key-a"]
+    with pytest.raises(FIRMSUnavailableError):
+        budget.acquire(1, priority=PRIORITY_CRON)
+
+
+def test_retries_are_charged_and_blocked_keys_skipped():
+    budget = FIRMSBudget(["key-a", "key-b", ""], limit=5, reserve=0)
+    assert budget.keys == ["key-a", "key-b"]
+
+    budget.charge("key-a")
+    assert budget.acquire(1) == ["key-b"]
+
+    budget.block("key-b")
+    assert budget.acquire(4) == ["key-a"] * 4
+    with pytest.raises(FIRMSUnavailableError):
+        budget.acquire(1)
+    assert [k["blocked"] for k in budget.status()["keys"]] == [False, True]
+
+
+def test_window_expires_old_calls():
+    budget = FIRMSBudget(["key-a"], limit=2, window_seconds=0.05, reserve=0)
+    budget.acquire(2)
+    with pytest.raises(FIRMSUnavailableError):
+        budget.acquire(1)
+    time.sleep(0.1)
+    assert budget.acquire(2) == ["key-a", "key-a"]
@@ -0,0 +1,47 @@
+import numpy as np
+
+from utils.geo import KM_PER_DEGREE, haversine_km, points_within_radius
+from utils.spatial import GridIndex
+
+
+def _random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-18.3, 0.0, n), rng.uniform(-81.3, -68.7, n)
+
+
+def test_km_per_degree_matches_haversine():
+    assert abs(haversine_km(0.0, 0.0, 1.0, 0.0) - KM_PER_DEGREE) < 1e-9
+
+
+def test_points_within_radius_matches_brute_force():
+    lats, lons = _random_points(2000)
+    indices, distances = points_within_radius(-9.0, -75.0, lats, lons, 150, return_distances=True)
+
+    expected = [i for i in range(len(lats)) if haversine_km(-9.0, -75.0, lats[i], lons[i]) <= 150]
+    assert sorted(indices.tolist()) == expected
+    assert np.all(distances <= 150)
+    assert np.array_equal(points_within_radius(-9.0, -75.0, lats, lons, 150), indices)
+
+
+def test_points_within_radius_includes_boundary():
+    # Un punto exactamente a 1° de latitud está a KM_PER_DEGREE km
+    indices = points_within_radius(0.0, 0.0, [1.0, 1.001], [0.0, 0.0], KM_PER_DEGREE)
+    assert indices.tolist() == [0]
+
+
+def test_grid_query_radius_matches_brute_force():
+    lats, lons = _random_points(5000, seed=1)
+    index = GridIndex(lats, lons, cell_deg=0.25)
+
+    for lat, lon, radius in [(-9.0, -75.0, 20), (-0.1, -70.0, 60), (-18.0, -81.0, 5)]:
+        indices, distances = index.query_radius(lat, lon, radius)
+        expected = points_within_radius(lat, lon, lats, lons, radius)
+        assert sorted(indices.tolist()) == sorted(expected.tolist())
+        assert np.all(np.diff(distances) >= 0)
+
+
+def test_grid_query_radius_on_cell_edge():
+    # Un punto justo del otro lado del borde de celda y a menos del radio
+    index = GridIndex([-8.2501], [-75.0], cell_deg=0.25)
+    indices, _ = index.query_radius(-8.2499 + 0.0002, -75.0, 1)
+    assert indices.tolist() == [0]
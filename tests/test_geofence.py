@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import numpy as np
+
+import services.geofence as geofence_module
+from models.fires import RECORD_FIELDS, FireBatch
+from services.geofence import REBUILD_AFTER, GeofenceIndex
+from tasks.check_fires import _load_active_adoption_ids, _load_active_adoptions, _load_adoptions_by_id
+from tasks.replay import InMemoryDatabase
+
+
+def _adoption(adoption_id, lat, lon, email="guardian@example.com"):
+    return {
+        'id': adoption_id,
+        'forest_id': f"forest-{adoption_id}",
+        'guardian_name': "Guardian",
+        'guardian_email': email,
+        'is_active': True,
+        'forests': {'id': f"forest-{adoption_id}", 'name': "Bosque", 'latitude': lat, 'longitude': lon}
+    }
+
+
+def _fires(*points):
+    lines = [",".join(RECORD_FIELDS)]
+    for lat, lon in points:
+        lines.append(f"{lat},{lon},330.0,0.4,0.4,2026-10-16,0300,N,VIIRS,n,2.0NRT,290.0,5.0,D")
+    return FireBatch.from_csv(lines)
+
+
+def _sync(index, db, loaded):
+    def load(ids):
+        loaded.append(list(ids))
+        return _load_adoptions_by_id(db, ids)
+    return index.sync(_load_active_adoption_ids(db), load)
+
+
+def test_sync_applies_changes_made_outside_the_api(tmp_path):
+    db = InMemoryDatabase({'adopted_forests': [_adoption("a1", -8.0, -75.0), _adoption("a2", -9.0, -74.0)]})
+    index = GeofenceIndex(str(tmp_path / "geofence.json"), radius_km=20)
+    index.ensure_fresh(lambda: _load_active_adoptions(db))
+
+    # Alta directa en la base y baja de a1
+    db.tables['adopted_forests'].append(_adoption("a3", -10.0, -73.0))
+    db.tables['adopted_forests'][0]['is_active'] = False
+
+    loaded = []
+    assert _sync(index, db, loaded) == (1, 1)
+    assert loaded == [["a3"]]
+
+    matches = index.match(_fires((-8.0, -75.0), (-10.05, -73.0)))
+    assert [sub['adoption_id'] for sub, _, _ in matches] == ["a3"]
+
+
+def test_unchanged_adoptions_do_not_reload_forests(tmp_path):
+    db = InMemoryDatabase({'adopted_forests': [_adoption(f"a{i}", -8.0 - i, -75.0) for i in range(5)]})
+    index = GeofenceIndex(str(tmp_path / "geofence.json"), radius_km=20)
+    index.ensure_fresh(lambda: _load_active_adoptions(db))
+
+    full_loads = []
+    index.ensure_fresh(lambda: full_loads.append(1) or [])
+    loaded = []
+    assert _sync(index, db, loaded) == (0, 0)
+    assert full_loads == [] and loaded == []
+
+
+def test_periodic_rebuild(tmp_path, monkeypatch):
+    db = InMemoryDatabase({'adopted_forests': [_adoption("a1", -8.0, -75.0)]})
+    index = GeofenceIndex(str(tmp_path / "geofence.json"), radius_km=20)
+    index.ensure_fresh(lambda: _load_active_adoptions(db))
+
+    # Coordenadas editadas: solo la reconstrucción periódica las toma
+    db.tables['adopted_forests'][0]['forests']['latitude'] = -12.0
+    later = datetime.now() + REBUILD_AFTER * 2
+
+    class _Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return later
+
+    monkeypatch.setattr(geofence_module, "datetime", _Later)
+    index.ensure_fresh(lambda: _load_active_adoptions(db))
+    assert [sub['adoption_id'] for sub, _, _ in index.match(_fires((-12.0, -75.0)))] == ["a1"]
+
+
+def test_add_is_idempotent_and_matches_by_distance(tmp_path):
+    index = GeofenceIndex(str(tmp_path / "geofence.json"), radius_km=20)
+    index.rebuild([])
+    adoption = _adoption("a1", -8.0, -75.0)
+    index.add(adoption, adoption['forests'])
+    index.add(adoption, adoption['forests'])
+    assert len(index) == 1
+
+    # ~11 km y ~33 km al norte del bosque
+    matches = index.match(_fires((-7.9, -75.0), (-7.7, -75.0)))
+    assert len(matches) == 1
+    sub, indices, distances = matches[0]
+    assert indices.tolist() == [0]
+    assert np.all(distances <= 20)
+
+    # Otro proceso lee el mismo archivo
+    assert len(GeofenceIndex(str(tmp_path / "geofence.json"), radius_km=20)) == 1
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from services.job_runner import JobRunner
+
+
+def _wait(job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if job.state not in ("queued", "running"):
+            return
+        time.sleep(0.01)
+
+
+def test_same_key_coalesces_and_other_key_runs_alongside():
+    runner = JobRunner(max_workers=2)
+    release = threading.Event()
+
+    def slow(job):
+        job.stage("fetch")
+        release.wait(5)
+        return "checked"
+
+    def quick(job):
+        job.count("pixels", 3)
+        return "refreshed"
+
+    try:
+        first = runner.submit("check-fires", slow, key="check-fires")
+        assert runner.submit("check-fires", slow, key="check-fires") is first
+        assert first.coalesced == 1
+
+        # El refresco de NDVI no espera a la verificación en curso
+        tile = runner.submit("refresh-ndvi-tile", quick, key="refresh-ndvi-tile")
+        _wait(tile)
+        assert tile.state == "succeeded" and tile.counts["pixels"] == 3
+        assert first.state == "running"
+
+        release.set()
+        _wait(first)
+        assert runner.get(first.id).result == "checked"
+    finally:
+        release.set()
+        runner.shutdown()
+
+
+def test_failed_job_records_error_and_frees_the_key():
+    runner = JobRunner()
+
+    def failing(job):
+        raise RuntimeError("lease perdido")
+
+    try:
+        job = runner.submit("check-fires", failing, key="check-fires")
+        _wait(job)
+        assert job.state == "failed" and "lease perdido" in job.error
+        assert runner.submit("check-fires", failing, key="check-fires") is not job
+    finally:
+        runner.shutdown()
@@ -0,0 +1,100 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from services.ndvi_cache import MODIS_PIXEL_DEG, NDVICache, next_expiry
+from services.ndvi_history import NDVIHistoryStore
+from services.ndvi_tile import NODATA, NDVITile
+
+# Ventana chica (48 x 48 píxeles) alineada a la grilla de MODIS
+BBOX = (-75.0, -8.0, -74.9, -7.9)
+
+
+def test_cache_shares_pixel_and_respects_expiry(tmp_path):
+    cache = NDVICache(str(tmp_path / "ndvi.sqlite"))
+    composite = (date.today() - timedelta(days=5)).isoformat()
+    cache.put_many([(-8.001, -75.001, 6500, composite)])
+
+    # Otro punto del mismo píxel comparte el valor
+    nearby = (-8.001 - MODIS_PIXEL_DEG / 4, -75.001)
+    assert cache.get_many({"p": nearby})["p"]["ndvi_raw"] == 6500
+    assert cache.get_many({"q": (-8.1, -75.1)}) == {}
+
+    with sqlite3.connect(str(tmp_path / "ndvi.sqlite")) as conn:
+        conn.execute("UPDATE ndvi SET expires_at = ?", ((datetime.now() - timedelta(hours=1)).isoformat(),))
+    assert cache.get_many({"p": nearby}) == {}
+    assert cache.get_many({"p": nearby}, include_expired=True)["p"]["composite_date"] == composite
+
+
+def test_cache_purge_and_expiry_schedule(tmp_path):
+    cache = NDVICache(str(tmp_path / "ndvi.sqlite"))
+    old = (date.today() - timedelta(days=200)).isoformat()
+    cache.put_many([(-8.0, -75.0, 5000, old)])
+    cache.purge()
+    assert cache.get_many({"p": (-8.0, -75.0)}, include_expired=True) == {}
+
+    now = datetime(2026, 10, 17, 12)
+    assert next_expiry("2026-10-01", now) == datetime(2026, 11, 2)
+    assert next_expiry("2026-09-01", now) == now + timedelta(hours=12)
+
+
+def _refresh(tile, composite_date):
+    def fetch_chunk(west, north, width, height):
+        values = np.full((height, width), 7000, dtype=np.int16)
+        values[0, 0] = NODATA
+        return values
+    tile.refresh(composite_date, fetch_chunk)
+
+
+def test_tile_lookup_window_and_nodata(tmp_path):
+    tile = NDVITile(str(tmp_path / "tile"), bbox=BBOX)
+    assert tile.lookup(-7.95, -74.95) is None
+
+    composite = (date.today() - timedelta(days=5)).isoformat()
+    _refresh(tile, composite)
+    assert tile.lookup(-7.95, -74.95) == (7000, composite)
+    assert tile.lookup(-7.9001, -74.9999) is None  # Píxel noroeste sin dato
+    assert tile.lookup(-9.0, -74.95) is None  # Fuera del raster
+
+    window = tile.window(-7.9001, -74.9999, radius_pixels=2)
+    assert window.shape == (3, 3)  # Recortada en el borde
+    assert np.isnan(window[0, 0]) and np.nansum(window) == 7000 * 8
+
+    # Otro proceso ve el raster por el metadata.json
+    assert NDVITile(str(tmp_path / "tile"), bbox=BBOX).composite_date == composite
+
+
+def test_tile_stale_or_truncated_is_ignored(tmp_path):
+    tile = NDVITile(str(tmp_path / "tile"), bbox=BBOX)
+    _refresh(tile, (date.today() - timedelta(days=60)).isoformat())
+    assert tile.lookup(-7.95, -74.95) is None
+
+    _refresh(tile, date.today().isoformat())
+    with open(tmp_path / "tile" / "ndvi.int16", "r+b") as f:
+        f.truncate(100)
+    assert NDVITile(str(tmp_path / "tile"), bbox=BBOX).lookup(-7.95, -74.95) is None
+
+
+def test_history_merge_sorts_dedups_and_keeps_checked_at(tmp_path):
+    store = NDVIHistoryStore(str(tmp_path / "history.sqlite"))
+    assert store.get(-8.0, -75.0) is None
+
+    series = store.merge(-8.0, -75.0, [("2026-09-14", 6000), ("2026-09-30", None)], since=date(2026, 9, 1))
+    checked_at = series.checked_at
+
+    # Relleno hacia atrás: no cuenta como consulta de lo más reciente
+    series = store.merge(
+        -8.0, -75.0, [("2026-08-29", 5800), ("2026-09-14", 6100)],
+        since=date(2026, 8, 20), checked=False
+    )
+    assert series.checked_at == checked_at
+    assert series.since == date(2026, 8, 20).toordinal()
+    assert series.last_date == date(2026, 9, 30)
+
+    dates, values = store.get(-8.0, -75.0).range(date(2026, 8, 1), date(2026, 10, 31))
+    assert [date.fromordinal(int(d)).isoformat() for d in dates] == ["2026-08-29", "2026-09-14"]
+    assert values.tolist() == [5800, 6100]  # Última lectura; la composición enmascarada se omite
+
+    assert not series.needs_update(datetime.fromisoformat(checked_at))
+    assert series.needs_update(datetime(2026, 11, 2))
@@ -0,0 +1,70 @@
+import httpx
+import pytest
+
+from services.notification_dispatcher import NotificationDispatcher
+
+
+def _status_error(status):
+    request = httpx.Request("POST", "https://api.resend.com/emails/batch")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+
+class FakeNotifier:
+    """Registra cada request; `failures` son los errores a devolver en orden"""
+
+    def __init__(self, batch_failures=(), email_failures=()):
+        self.batch_failures = list(batch_failures)
+        self.email_failures = list(email_failures)
+        self.calls = []
+
+    def _send_batch(self, messages, idempotency_key=None, max_retries=None):
+        self.calls.append(("batch", idempotency_key, max_retries))
+        if self.batch_failures:
+            raise self.batch_failures.pop(0)
+        return {}
+
+    def _send_email(self, message, idempotency_key=None, max_retries=None):
+        self.calls.append(("email", idempotency_key, max_retries))
+        if self.email_failures:
+            raise self.email_failures.pop(0)
+        return {}
+
+
+def _dispatcher(notifier, **kwargs):
+    return NotificationDispatcher(notifier, rate_per_second=1000, backoff_seconds=0, **kwargs)
+
+
+MESSAGES = [{"to": ["a@example.com"]}, {"to": ["b@example.com"]}]
+
+
+def test_transient_errors_are_retried_with_the_same_key():
+    notifier = FakeNotifier(batch_failures=[_status_error(503), httpx.ReadTimeout("timeout")])
+    assert _dispatcher(notifier).dispatch(MESSAGES) == [True, True]
+
+    kinds, keys, retries = zip(*notifier.calls)
+    assert kinds == ("batch",) * 3
+    assert len(set(keys)) == 1
+    assert set(retries) == {0}  # Sin reintentos del pool: cada intento pasa por el bucket
+
+
+def test_rejected_batch_falls_back_to_single_emails():
+    notifier = FakeNotifier(batch_failures=[_status_error(422)], email_failures=[_status_error(422)])
+    assert _dispatcher(notifier).dispatch(MESSAGES) == [False, True]
+    assert [kind for kind, _, _ in notifier.calls] == ["batch", "email", "email"]
+
+
+@pytest.mark.parametrize("error", [_status_error(500), httpx.ReadTimeout("timeout"), _status_error(429)])
+def test_failed_batch_is_not_resent_per_message(error):
+    notifier = FakeNotifier(batch_failures=[error] * 10)
+    assert _dispatcher(notifier, max_retries=1).dispatch(MESSAGES) == [False, False]
+    assert {kind for kind, _, _ in notifier.calls} == {"batch"}
+
+
+def test_identical_payloads_get_new_keys_on_each_dispatch():
+    notifier = FakeNotifier()
+    dispatcher = _dispatcher(notifier)
+    dispatcher.dispatch(MESSAGES)
+    dispatcher.dispatch(MESSAGES)
+
+    first, second = (key for _, key, _ in notifier.calls)
+    assert first != second
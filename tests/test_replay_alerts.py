@@ -0,0 +1,105 @@
+from collections import Counter
+
+import pytest
+
+from tasks.check_fires import ALERTS_CONSUMER
+from tasks.replay import RecordingDispatcher, ReplayEnvironment, synthetic_adoptions, write_synthetic_firms_csv
+
+
+@pytest.fixture
+def firms_paths(tmp_path):
+    path = tmp_path / "viirs.csv"
+    write_synthetic_firms_csv(str(path), detections=2000, seed=1)
+    return [str(path)]
+
+
+@pytest.fixture
+def adoptions():
+    return synthetic_adoptions(600, seed=1)
+
+
+def test_one_digest_per_guardian(tmp_path, firms_paths, adoptions):
+    env = ReplayEnvironment(str(tmp_path / "run"), firms_paths, adoptions)
+    counts = env.run()
+
+    messages = env.dispatcher.messages
+    alerts = env.db.tables['alerts_sent']
+    assert messages, "el escenario sintético debería generar alertas"
+    assert counts['alerts_sent'] == len(messages) == len(alerts)
+
+    # Un email y una fila de alerta por guardián
+    recipients = Counter(email for message in messages for email in message['to'])
+    assert all(n == 1 for n in recipients.values())
+    assert set(recipients) == {row['guardian_email'] for row in alerts}
+
+    # Cada digest solo incluye bosques adoptados por ese guardián
+    adopted = {(a['forest_id'], a['guardian_email']) for a in adoptions}
+    for row in alerts:
+        assert row['alert_type'] == 'fire_digest'
+        forest_ids = row['alert_data']['forest_ids']
+        assert len(forest_ids) == len(set(forest_ids))
+        assert all((forest_id, row['guardian_email']) in adopted for forest_id in forest_ids)
+
+
+def test_same_download_is_not_alerted_twice(tmp_path, firms_paths, adoptions):
+    env = ReplayEnvironment(str(tmp_path / "run"), firms_paths, adoptions)
+    env.run()
+    sent = len(env.dispatcher.messages)
+
+    counts = env.run()
+    assert len(env.dispatcher.messages) == sent
+    assert counts.get('alerts_sent', 0) == 0
+
+
+def test_forests_alerted_today_are_skipped(tmp_path, firms_paths, adoptions):
+    first = ReplayEnvironment(str(tmp_path / "first"), firms_paths, adoptions)
+    first.run()
+    assert first.dispatcher.messages
+
+    # Almacén local nuevo (mismas detecciones otra vez) sobre la misma base
+    second = ReplayEnvironment(str(tmp_path / "second"), firms_paths, adoptions)
+    second.db = first.db
+    counts = second.run()
+
+    assert second.dispatcher.messages == []
+    assert counts['alerts_sent'] == 0
+    assert len(first.db.tables['alerts_sent']) == len(first.dispatcher.messages)
+
+
+class FlakyDispatcher(RecordingDispatcher):
+    """Falla la entrega de los mensajes de `failing` (solo en la primera corrida)"""
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    def dispatch(self, messages):
+        delivered = []
+        for message in messages:
+            ok = not (set(message['to']) & self.failing)
+            if ok:
+                self.messages.append(message)
+            delivered.append(ok)
+        self.failing = set()
+        return delivered
+
+
+def test_undelivered_digests_are_retried(tmp_path, firms_paths, adoptions):
+    reference = ReplayEnvironment(str(tmp_path / "reference"), firms_paths, adoptions)
+    reference.run()
+    recipients = sorted({email for message in reference.dispatcher.messages for email in message['to']})
+    failing = recipients[:2]
+
+    env = ReplayEnvironment(str(tmp_path / "run"), firms_paths, adoptions)
+    env.dispatcher = FlakyDispatcher(failing)
+    counts = env.run()
+    assert counts['alerts_failed'] == len(failing)
+    assert len(env.dispatcher.messages) == len(recipients) - len(failing)
+
+    # Las detecciones siguen pendientes: solo se reenvía lo que falló
+    fires, _ = env.store.changes_since(ALERTS_CONSUMER)
+    assert len(fires)
+    env.dispatcher.messages.clear()
+    counts = env.run()
+    assert sorted(email for message in env.dispatcher.messages for email in message['to']) == failing
+    assert not len(env.store.changes_since(ALERTS_CONSUMER)[0])
@@ -0,0 +1,81 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import tasks.check_fires as check_fires
+from services.job_runner import Job
+from services.run_lock import FileLeaseLock
+
+
+@pytest.fixture
+def lock(tmp_path):
+    return FileLeaseLock(str(tmp_path / "locks"))
+
+
+def _expire(lock, name):
+    path = lock._path(name)
+    with open(path) as f:
+        lease = json.load(f)
+    lease['expires_at'] = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    with open(path, "w") as f:
+        json.dump(lease, f)
+
+
+def test_lease_is_exclusive_until_released(lock):
+    assert lock.acquire("run", "a", 60)
+    assert not lock.acquire("run", "b", 60)
+    assert lock.acquire("run", "a", 60)  # El dueño puede volver a tomarlo
+
+    lock.release("run", "b")  # Solo el dueño lo libera
+    assert not lock.acquire("run", "b", 60)
+    lock.release("run", "a")
+    assert lock.acquire("run", "b", 60)
+
+
+def test_expired_lease_can_be_taken(lock):
+    assert lock.acquire("run", "a", 60)
+    _expire(lock, "run")
+    assert lock.acquire("run", "b", 60)
+    assert not lock.renew("run", "a", 60)
+
+
+def test_renew_extends_own_lease(lock):
+    assert lock.acquire("run", "a", 60)
+    assert lock.renew("run", "a", 3600)
+    assert not lock.renew("run", "b", 3600)
+    assert not lock.renew("other", "a", 3600)
+
+
+def test_purge_expired(lock):
+    lock.acquire("old", "a", 60)
+    lock.acquire("new", "a", 60)
+    _expire(lock, "old")
+    lock.purge_expired()
+    assert lock.acquire("old", "b", 60)
+    assert not lock.acquire("new", "b", 60)
+
+
+def test_run_aborts_when_lease_is_lost(lock, monkeypatch):
+    stages = []
+
+    def fake_check(job):
+        job.stage("ingest")
+        stages.append("ingest")
+        # Otro proceso toma el lease vencido mientras esta ejecución sigue
+        _expire(lock, check_fires.RUN_LOCK)
+        assert lock.acquire(check_fires.RUN_LOCK, "other", 60)
+        job.stage("dispatch")
+        stages.append("dispatch")
+        return job.counts
+
+    monkeypatch.setattr(check_fires, "cron_lock", lock)
+    monkeypatch.setattr(check_fires, "check_fires_and_alert", fake_check)
+
+    job = Job("check-fires")
+    with pytest.raises(RuntimeError):
+        check_fires.run_check_fires(job)
+    assert stages == ["ingest"]
+    # El lease del otro proceso sigue vigente y el slot quedó libre para reintentar
+    assert not lock.acquire(check_fires.RUN_LOCK, "third", 60)
+    assert lock.acquire(check_fires.slot_key(), "third", 60)
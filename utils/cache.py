@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class _Entry:
+    """Valor almacenado junto con el instante en que se cargó"""
+
+    __slots__ = ("value", "stored_at")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+
+
+class _Flight:
+    """Carga en curso para una clave (single-flight)"""
+
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """
+    Caché en memoria con TTL, stale-while-revalidate y single-flight
+
+    - Dentro del TTL el valor se sirve directamente.
+    - Entre TTL y TTL + stale se sirve el valor viejo y se refresca en segundo plano.
+    - Pasado ese margen, el primer llamador carga el valor y el resto espera
+      su resultado en lugar de repetir la carga.
+    """
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float = 0, max_entries: int = 64):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Obtiene el valor de la clave, cargándolo con `loader` si hace falta
+
+        Args:
+            key: Clave de la entrada
+            loader: Función sin argumentos que obtiene el valor fresco
+
+        Returns:
+            Valor cacheado o recién cargado (propaga la excepción del loader)
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    return entry.value
+                if age < self.ttl_seconds + self.stale_seconds:
+                    # Servir valor viejo y refrescar en segundo plano (una sola vez)
+                    if key not in self._flights:
+                        flight = self._flights[key] = _Flight()
+                        threading.Thread(
+                            target=self._load,
+                            args=(key, loader, flight),
+                            daemon=True
+                        ).start()
+                    return entry.value
+
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+
+        if is_leader:
+            self._load(key, loader, flight)
+        else:
+            flight.event.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    async def aget_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Versión async de `get_or_load` para el event loop
+
+        Las cargas concurrentes de la misma clave dentro del loop esperan un
+        único Future en lugar de bloquear hilos.
+
+        Args:
+            key: Clave de la entrada
+            loader: Función sin argumentos que devuelve una corrutina con el valor fresco
+
+        Returns:
+            Valor cacheado o recién cargado (propaga la excepción del loader)
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                if age < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    return entry.value
+                if age < self.ttl_seconds + self.stale_seconds:
+                    if key not in self._async_flights:
+                        self._spawn(key, loader)
+                    return entry.value
+
+        future = self._async_flights.get(key)
+        if future is None:
+            future = self._spawn(key, loader)
+
+        # shield: si un request se cancela, la carga sigue para los demás
+        return await asyncio.shield(future)
+
+    def _spawn(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> "asyncio.Future":
+        future = self._async_flights[key] = asyncio.ensure_future(self._aload(key, loader))
+        # Los refrescos en segundo plano no tienen quien espere su error
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def _aload(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self._store(key, value)
+            return value
+        finally:
+            self._async_flights.pop(key, None)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Devuelve el último valor conocido sin importar su antigüedad"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Elimina una entrada (o todas si no se indica clave)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], flight: _Flight) -> None:
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+        else:
+            self._store(key, flight.value)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
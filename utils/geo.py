@@ -0,0 +1,68 @@
+import numpy as np
+from math import pi
+from typing import Tuple, Union
+
+EARTH_RADIUS_KM = 6371.0
+# Km por grado de latitud en la misma esfera que usa haversine_km
+KM_PER_DEGREE = EARTH_RADIUS_KM * pi / 180
+
+ArrayLike = Union[float, np.ndarray, list]
+
+
+def haversine_km(lat1: ArrayLike, lon1: ArrayLike, lat2: ArrayLike, lon2: ArrayLike) -> np.ndarray:
+    """
+    Distancia Haversine en km con broadcasting de NumPy
+
+    Acepta escalares o arrays de formas compatibles (uno a muchos,
+    muchos a muchos con ejes expandidos, etc.).
+    """
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2)
+    )
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_from_point(lat: float, lon: float, lats: ArrayLike, lons: ArrayLike) -> np.ndarray:
+    """Distancias (km) desde un punto a un arreglo de puntos"""
+    return haversine_km(lat, lon, lats, lons)
+
+
+def points_within_radius(
+    lat: float,
+    lon: float,
+    lats: ArrayLike,
+    lons: ArrayLike,
+    radius_km: float,
+    return_distances: bool = False
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Índices de los puntos a `radius_km` o menos de (lat, lon)
+
+    Args:
+        lat, lon: Punto de referencia
+        lats, lons: Arreglos de coordenadas
+        radius_km: Radio máximo en km
+        return_distances: Devolver también las distancias de los índices
+
+    Returns:
+        Índices (o tupla índices, distancias) sin ordenar
+    """
+    distances = distances_from_point(lat, lon, lats, lons)
+    indices = np.flatnonzero(distances <= radius_km)
+
+    if return_distances:
+        return indices, distances[indices]
+    return indices
+
+
+def pairwise_distances(lats1: ArrayLike, lons1: ArrayLike, lats2: ArrayLike, lons2: ArrayLike) -> np.ndarray:
+    """Matriz (M, N) de distancias en km entre dos conjuntos de puntos"""
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, np.newaxis]
+    lons1 = np.asarray(lons1, dtype=np.float64)[:, np.newaxis]
+    return haversine_km(lats1, lons1, lats2, lons2)
+
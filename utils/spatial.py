@@ -0,0 +1,97 @@
+import numpy as np
+from math import radians, cos, floor
+from typing import Dict, Iterable, List, Tuple
+
+from utils.geo import KM_PER_DEGREE, points_within_radius
+
+# Desplazamiento para codificar (fila, columna) de celda en un entero
+_ROW_STRIDE = 1 << 24
+
+
+def _as_float_array(values: Iterable[float]) -> np.ndarray:
+    if isinstance(values, np.ndarray):
+        return values.astype(np.float64, copy=False)
+    return np.fromiter(values, dtype=np.float64)
+
+
+class GridIndex:
+    """
+    Índice espacial de grilla uniforme lat/lon
+
+    Cada punto se asigna a una celda de `cell_deg` grados. Una consulta por
+    radio solo revisa las celdas que cubren el círculo de búsqueda, por lo que
+    el costo depende de los puntos cercanos y no del total.
+    """
+
+    def __init__(self, latitudes: Iterable[float], longitudes: Iterable[float], cell_deg: float = 0.25):
+        self.cell_deg = cell_deg
+        self.latitudes = _as_float_array(latitudes)
+        self.longitudes = _as_float_array(longitudes)
+        self._cells: Dict[int, np.ndarray] = {}
+
+        if len(self.latitudes) == 0:
+            return
+
+        keys = self._cell_keys(self.latitudes, self.longitudes)
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        for key, start, end in zip(unique_keys.tolist(), starts, ends):
+            self._cells[key] = order[start:end]
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def _cell_keys(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        rows = np.floor(lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(lons / self.cell_deg).astype(np.int64)
+        return rows * _ROW_STRIDE + cols
+
+    def _candidate_cells(self, lat: float, lon: float, radius_km: float) -> Iterable[int]:
+        """Celdas que cubren el rectángulo envolvente del círculo de búsqueda"""
+        dlat = radius_km / KM_PER_DEGREE
+        max_lat = min(89.9, abs(lat) + dlat)
+        dlon = min(180.0, radius_km / (KM_PER_DEGREE * cos(radians(max_lat))))
+
+        row0, row1 = floor((lat - dlat) / self.cell_deg), floor((lat + dlat) / self.cell_deg)
+        col0, col1 = floor((lon - dlon) / self.cell_deg), floor((lon + dlon) / self.cell_deg)
+
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                yield row * _ROW_STRIDE + col
+
+    def candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Índices de los puntos en las celdas que cubren el radio (sin filtrar)"""
+        buckets: List[np.ndarray] = [
+            self._cells[key]
+            for key in self._candidate_cells(lat, lon, radius_km)
+            if key in self._cells
+        ]
+        if not buckets:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(buckets)
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca puntos dentro de un radio
+
+        Args:
+            lat: Latitud del centro
+            lon: Longitud del centro
+            radius_km: Radio de búsqueda en km
+
+        Returns:
+            Tupla (índices, distancias_km) ordenada por distancia
+        """
+        candidates = self.candidates(lat, lon, radius_km)
+        within, distances = points_within_radius(
+            lat, lon,
+            self.latitudes[candidates], self.longitudes[candidates],
+            radius_km,
+            return_distances=True
+        )
+        indices = candidates[within]
+
+        order = np.argsort(distances, kind="stable")
+        return indices[order], distances[order]
@@ -0,0 +1,38 @@
+import json
+import os
+import numpy as np
+from typing import Any, Optional
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """Escribe JSON reemplazando el archivo de forma atómica"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """Lee JSON o devuelve `default` si el archivo no existe"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_array_atomic(path: str, values: np.ndarray) -> None:
+    """Guarda un arreglo .npy reemplazando el archivo de forma atómica"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def read_array(path: str, mmap: bool = False) -> Optional[np.ndarray]:
+    """Lee un .npy (memory-mapped si `mmap`) o None si no existe"""
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)